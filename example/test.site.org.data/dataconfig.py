@@ -56,6 +56,46 @@ DUPLICATEHOME = False
 # If True, show news box on homepage
 SHOWNEWS = False
 
+# Number of posts per page on section pages (including 'selected' and 'feed')
+# If a section has more posts, it's split over several pages:
+# e.g., wine/, wine/page/2/, wine/page/3/, etc.
+# 0 means all posts on one page
+PAGESIZE = 0
+
+# This dict maps url key to the number of posts per page,
+# overriding PAGESIZE for particular sections
+d_URL2PAGESIZE = {}
+
+# Read the content from an SQLite database in the data directory,
+# rather than from the content json files (see scripts/contentdb.py)
+# '' means use the content json files
+CONTENTDB = ''
+
+# If True, link static assets by fingerprinted names (e.g., theme.min.<hash>.css),
+# so they can be cached forever, and write a cache policy (see scripts/fingerprint.py)
+FINGERPRINT = False
+
+# If True, each page links one bundle of its CSS files and one of its JS files,
+# rather than the separate files (see scripts/bundle.py)
+BUNDLE = False
+
+# If True, remove the CSS rules the site doesn't use (see scripts/prunecss.py)
+PRUNECSS = False
+
+# If True, link the social media icons from one SVG sprite (static/img/social.svg),
+# rather than inlining them in every page
+SOCIALSPRITE = False
+
+# If False, drop the "Built with SimpleSiteGenerator" comment from pages
+KEEPBANNER = True
+
+# If True, inline each template's critical CSS and load the stylesheets asynchronously
+# (see scripts/criticalcss.py)
+CRITICALCSS = False
+
+# Classes which PRUNECSS (and CRITICALCSS) should keep although they're not in the HTML (e.g., classes added by JS)
+l_CSS_ALLOWLIST = ['ssg-vis-hide', 'ssg-vis-show']
+
 ### Sidebar (Navbar)
 
 # Sidebar url keys
@@ -170,6 +210,11 @@ NUMPOSTSFEED = 5
 # Create a Latest Feed set of pages (containing NUMPOSTSFEED pages)
 LATESTFEED = False
 
+# How to write pages which duplicate another page (the Latest Feed, the homepage's copy):
+# 'copy' (the whole page), 'canonical' (the whole page, with a canonical link to the original),
+# or 'alias' (a small page which links and redirects to the original)
+DUPLICATES = 'copy'
+
 l_SPECIAL_PAGES = [
     {
         "name": "Cover",
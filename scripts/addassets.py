@@ -0,0 +1,261 @@
+#-------------------------------------------------------------------------------
+#
+#    addassets.py
+#
+#    Copy static assets to the output directory (this replaces add_assets.sh).
+#    CSS and JS are minified (see minify.py); imgs and videos are copied
+#    (or hardlinked). Only new or changed files are processed: a file is
+#    unchanged if its size and modification time (or, failing that, its hash)
+#    match the output's, as kept in the asset index (see assetindex.py).
+#    Copies run in a thread pool
+#
+#-------------------------------------------------------------------------------
+
+import os
+import json
+import shutil
+import concurrent.futures
+import colorme as color
+import minify
+
+# The number of threads used to copy files
+THREADS = 8
+
+def getassettasks(datadir, outputdir, staticdir, assets, l_referenced=None):
+    """
+    Get the assets to minify and to copy, as in add_assets.sh:
+    the custom JS and the CSS of the repository (minified),
+    its vendor JS, the site's static imgs, and the imgs and videos of posts
+
+    :param datadir: (str) path to the data directory
+    :param outputdir: (str) path to the output directory
+    :param staticdir: (str) path to the repository's static directory (CSS and JS)
+    :param assets: (AssetIndex) the asset index
+    :param l_referenced: (list) the CSS and JS files (paths in the output directory)
+        referenced by the site. CSS and JS files which aren't referenced are skipped.
+        If None, don't skip any
+    :returns: (tuple) a list of (source directory, file, output directory, output file, minifier)
+        tuples to minify, and a list of (source directory, file, output directory) tuples to copy
+    :rtype: tuple
+    """
+
+    if l_referenced is not None:
+        s_referenced = set([i.lstrip('/') for i in l_referenced])
+
+    def isreferenced(myfile):
+        return l_referenced is None or myfile in s_referenced
+
+    l_minify = []
+    for srcdir, ext, dstdir, minifier in [
+            (f'{staticdir}/js/custom', '.js', 'static/js', minify.minifyjs),
+            (f'{staticdir}/css', '.css', 'static/css', minify.minifycss)
+        ]:
+        for i in sorted(assets.scan(srcdir)):
+            if i.endswith(ext):
+                dstfile = i[:-len(ext)] + '.min' + ext
+                if isreferenced(f'{dstdir}/{dstfile}'):
+                    l_minify.append((srcdir, i, f'{outputdir}/{dstdir}', dstfile, minifier))
+
+    l_dirs = [
+        (f'{staticdir}/js/vendor', 'static/js'),
+        (f'{datadir}/static/img', 'static/img'),
+        (f'{datadir}/published/img', 'static/img'),
+        (f'{datadir}/published/video', 'static/video')
+    ]
+    for i in assets.subdirs(f'{datadir}/published/article'):
+        l_dirs.append((f'{datadir}/published/article/{i}/img', 'static/img'))
+        l_dirs.append((f'{datadir}/published/article/{i}/video', 'static/video'))
+
+    l_copy = []
+    for srcdir, dstdir in l_dirs:
+        for i in assets.listfiles(srcdir):
+            # Vendor JS is only copied if it's used
+            if dstdir == 'static/js' and not (i.endswith('.js') and isreferenced(f'{dstdir}/{i}')):
+                continue
+            l_copy.append((srcdir, i, f'{outputdir}/{dstdir}'))
+
+    return l_minify, l_copy
+
+def isuptodate(assets, srcdir, myfile, dstdir):
+    """
+    Is the copy in the output directory the same as the source file?
+
+    :param assets: (AssetIndex) the asset index
+    :param srcdir: (str) the source directory
+    :param myfile: (str) the file, relative to the source directory
+    :param dstdir: (str) the output directory
+    :returns: (bool) True if the copy is up to date
+    :rtype: bool
+    """
+
+    src = assets.getentry(srcdir, myfile)
+    dst = assets.getentry(dstdir, myfile)
+
+    if dst is None or src[0] != dst[0]:
+        return False
+
+    # Same size and mtime: the quick check, as in rsync
+    if src[1] == dst[1]:
+        return True
+
+    # Same size but different mtime (e.g., a fresh checkout): compare the content
+    if assets.gethash(srcdir, myfile) == assets.gethash(dstdir, myfile):
+        # Match the mtimes, so next time the quick check is enough
+        os.utime(os.path.join(dstdir, myfile), ns=(src[1], src[1]))
+        assets.setentry(dstdir, myfile, assets.gethash(srcdir, myfile))
+        return True
+
+    return False
+
+def copyfile(srcdir, myfile, dstdir, hardlink=False):
+    """
+    Copy a file (keeping its mtime), or hardlink it
+
+    :param srcdir: (str) the source directory
+    :param myfile: (str) the file, relative to the source directory
+    :param dstdir: (str) the output directory
+    :param hardlink: (bool) if True, hardlink rather than copy (falls back to copying)
+    :returns: (int) the number of bytes copied (0 for a hardlink)
+    :rtype: int
+    """
+
+    src = os.path.join(srcdir, myfile)
+    dst = os.path.join(dstdir, myfile)
+    tmp = f'{dst}.tmp'
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+    if hardlink:
+        try:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            os.link(src, tmp)
+            os.replace(tmp, dst)
+            return 0
+        except OSError:
+            # E.g., a different file system
+            pass
+
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+    return os.path.getsize(dst)
+
+def minifyfile(assets, srcdir, myfile, dstdir, dstfile, minifier, d_minified):
+    """
+    Minify a file, unless the source didn't change since it was last minified
+
+    :param assets: (AssetIndex) the asset index
+    :param srcdir: (str) the source directory
+    :param myfile: (str) the source file
+    :param dstdir: (str) the output directory
+    :param dstfile: (str) the output file
+    :param minifier: (function) the minifier (str -> str)
+    :param d_minified: (dict) a dict whose keys are output files and whose values
+        are the hashes of the sources they were minified from (updated in place)
+    :returns: (int) the number of bytes written (0 if up to date)
+    :rtype: int
+    """
+
+    dst = os.path.join(dstdir, dstfile)
+    srchash = assets.gethash(srcdir, myfile)
+
+    if d_minified.get(dst) == srchash and assets.exists(dstdir, dstfile):
+        return 0
+
+    with open(os.path.join(srcdir, myfile), 'r') as f:
+        mybytes = minifier(f.read()).encode()
+
+    os.makedirs(dstdir, exist_ok=True)
+    with open(f'{dst}.tmp', 'wb') as f:
+        f.write(mybytes)
+    os.replace(f'{dst}.tmp', dst)
+
+    assets.setentry(dstdir, dstfile)
+    d_minified[dst] = srchash
+
+    return len(mybytes)
+
+def addassets(
+        datadir,
+        outputdir,
+        staticdir,
+        assets,
+        minifiedfile,
+        l_referenced=None,
+        hardlink=False,
+        threads=THREADS,
+        force=False,
+        verbose=False
+    ):
+    """
+    Minify and copy the static assets to the output directory
+
+    :param datadir: (str) path to the data directory
+    :param outputdir: (str) path to the output directory
+    :param staticdir: (str) path to the repository's static directory (CSS and JS)
+    :param assets: (AssetIndex) the asset index (updated with the output files)
+    :param minifiedfile: (str) path to the record of minified files (in the cache directory)
+    :param l_referenced: (list) the CSS and JS files referenced by the site (see getassettasks())
+    :param hardlink: (bool) if True, hardlink imgs and videos rather than copy them
+    :param threads: (int) the number of threads used to copy files
+    :param force: (bool) if True, minify every CSS and JS file, changed or not
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) the number of files minified and copied, and the bytes moved
+    :rtype: dict
+    """
+
+    for i in ['css', 'js', 'img', 'video']:
+        os.makedirs(f'{outputdir}/static/{i}', exist_ok=True)
+
+    l_minify, l_copy = getassettasks(datadir, outputdir, staticdir, assets, l_referenced)
+
+    d_stats = {'minified': 0, 'copied': 0, 'unchanged': 0, 'bytes': 0}
+
+    ## Minify CSS and JS
+
+    d_minified = dict()
+    if not force:
+        try:
+            with open(minifiedfile, 'r') as f:
+                d_minified = json.load(f)
+        except:
+            pass
+
+    for srcdir, myfile, dstdir, dstfile, minifier in l_minify:
+        numbytes = minifyfile(assets, srcdir, myfile, dstdir, dstfile, minifier, d_minified)
+        if numbytes:
+            if verbose:
+                print(f'Minified {srcdir}/{myfile} -> {dstdir}/{dstfile}')
+            d_stats['minified'] += 1
+            d_stats['bytes'] += numbytes
+        else:
+            d_stats['unchanged'] += 1
+
+    os.makedirs(os.path.dirname(minifiedfile), exist_ok=True)
+    with open(minifiedfile, 'w') as f:
+        json.dump(d_minified, f)
+
+    ## Copy imgs, videos, etc.
+
+    # Decide what to copy here (the index isn't shared with the threads)
+    l_tocopy = []
+    for srcdir, myfile, dstdir in l_copy:
+        if isuptodate(assets, srcdir, myfile, dstdir):
+            d_stats['unchanged'] += 1
+        else:
+            l_tocopy.append((srcdir, myfile, dstdir))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+        l_futures = [executor.submit(copyfile, srcdir, myfile, dstdir, hardlink) for srcdir, myfile, dstdir in l_tocopy]
+        for (srcdir, myfile, dstdir), future in zip(l_tocopy, l_futures):
+            d_stats['bytes'] += future.result()
+            d_stats['copied'] += 1
+            # The copy has the same content (and so the same hash) as the source
+            assets.setentry(dstdir, myfile, assets.getentry(srcdir, myfile)[2])
+            if verbose:
+                print(f'Copied {srcdir}/{myfile} -> {dstdir}/{myfile}')
+
+    color.okprint(f"Assets: {d_stats['minified']} minified, {d_stats['copied']} copied, {d_stats['unchanged']} unchanged ({d_stats['bytes']} bytes moved)")
+
+    return d_stats
@@ -0,0 +1,225 @@
+#-------------------------------------------------------------------------------
+#
+#    assetindex.py
+#
+#    An index of the files in the asset directories (imgs, videos, templates,
+#    CSS, JS, etc.). Each directory is read once, with os.scandir, and then
+#    questions like "does this file exist?" or "did this file change?"
+#    are answered from memory rather than with a stat call per file.
+#    The size, modification time, and hash of every file are cached
+#    between runs, so a file's hash is only computed again if it changed
+#
+#-------------------------------------------------------------------------------
+
+import os
+import json
+import hashlib
+
+class AssetIndex:
+    """
+    An index of files, by directory.
+
+    Each entry is a list: [size, mtime (in ns), hash], where the hash
+    is '' until someone asks for it (see gethash())
+    """
+
+    def __init__(self, d_cache=None):
+        """
+        :param d_cache: (dict) the index from the previous run (see load()):
+            a dict whose keys are directories and whose values are dicts
+            mapping file names to entries
+        """
+
+        # The index from the previous run
+        self.d_prev = d_cache if d_cache is not None else dict()
+        # A dict whose keys are directories and whose values are dicts
+        # mapping file names to entries (only for directories scanned in this run)
+        self.d_dirs = dict()
+        # A dict whose keys are directories and whose values are lists of their subdirectories
+        self.d_subdirs = dict()
+
+    @classmethod
+    def load(cls, cachefile):
+        """
+        :param cachefile: (str) path to the cached index (e.g., in .ssgcache/)
+        :returns: the index, with the previous run's entries (or none if there's no cache)
+        :rtype: AssetIndex
+        """
+
+        try:
+            with open(cachefile, 'r') as f:
+                return cls(json.load(f))
+        except:
+            return cls()
+
+    def save(self, cachefile):
+        """
+        Save the index, so the next run can reuse the hashes
+
+        :param cachefile: (str) path to the cached index
+        """
+
+        # Directories not scanned in this run keep their old entries
+        d_cache = {**self.d_prev, **self.d_dirs}
+
+        os.makedirs(os.path.dirname(cachefile) or '.', exist_ok=True)
+        tmpfile = f'{cachefile}.tmp'
+        with open(tmpfile, 'w') as f:
+            json.dump(d_cache, f)
+        os.replace(tmpfile, cachefile)
+
+    def scan(self, mydirectory):
+        """
+        Read a directory (once per run), reusing the cached hashes of unchanged files
+
+        :param mydirectory: (str) path to the directory
+        :returns: (dict) a dict whose keys are file names and whose values are entries
+        :rtype: dict
+        """
+
+        mydirectory = os.path.normpath(mydirectory)
+
+        if mydirectory in self.d_dirs:
+            return self.d_dirs[mydirectory]
+
+        d_prev = self.d_prev.get(mydirectory, dict())
+        d_files = dict()
+        l_subdirs = []
+
+        try:
+            with os.scandir(mydirectory) as it:
+                for i in it:
+                    if i.is_dir():
+                        l_subdirs.append(i.name)
+                    if not i.is_file():
+                        continue
+                    mystat = i.stat()
+                    entry = [mystat.st_size, mystat.st_mtime_ns, '']
+                    # Same size and mtime as last time: keep the hash
+                    old = d_prev.get(i.name)
+                    if old and old[:2] == entry[:2]:
+                        entry[2] = old[2]
+                    d_files[i.name] = entry
+        except FileNotFoundError:
+            pass
+
+        self.d_dirs[mydirectory] = d_files
+        self.d_subdirs[mydirectory] = sorted(l_subdirs)
+
+        return d_files
+
+    def subdirs(self, mydirectory):
+        """
+        :param mydirectory: (str) path to the directory
+        :returns: (list) the names of its subdirectories
+        :rtype: list
+        """
+
+        self.scan(mydirectory)
+
+        return self.d_subdirs[os.path.normpath(mydirectory)]
+
+    def listfiles(self, mydirectory, prefix=''):
+        """
+        List the files in a directory, and in its subdirectories
+
+        :param mydirectory: (str) path to the directory
+        :param prefix: (str) the path of the directory relative to the top directory (used in recursion)
+        :returns: (list) the files, relative to the directory
+        :rtype: list
+        """
+
+        l = [prefix + i for i in sorted(self.scan(mydirectory))]
+
+        for i in self.subdirs(mydirectory):
+            l.extend(self.listfiles(f'{mydirectory}/{i}', prefix = f'{prefix}{i}/'))
+
+        return l
+
+    def setentry(self, mydirectory, myfile, myhash=''):
+        """
+        Update the entry of a file after writing it (e.g., after copying an asset)
+
+        :param mydirectory: (str) path to the directory
+        :param myfile: (str) the file, relative to the directory
+        :param myhash: (str) the hash of the file's content, if known
+        """
+
+        mydirectory, myname = os.path.split(os.path.normpath(os.path.join(mydirectory, myfile)))
+        d_files = self.scan(mydirectory)
+
+        mystat = os.stat(os.path.join(mydirectory, myname))
+        d_files[myname] = [mystat.st_size, mystat.st_mtime_ns, myhash]
+
+    def getentry(self, mydirectory, myfile):
+        """
+        :param mydirectory: (str) path to the directory
+        :param myfile: (str) the file, relative to the directory (e.g., static/css/theme.css)
+        :returns: (list) the entry of the file, or None if it doesn't exist
+        :rtype: list
+        """
+
+        # Index the directory the file is actually in
+        mydirectory, myname = os.path.split(os.path.join(mydirectory, myfile))
+
+        return self.scan(mydirectory).get(myname)
+
+    def exists(self, mydirectory, myfile):
+        """
+        :param mydirectory: (str) path to the directory
+        :param myfile: (str) the file, relative to the directory
+        :returns: (bool) True if the file exists
+        :rtype: bool
+        """
+
+        return self.getentry(mydirectory, myfile) is not None
+
+    def missing(self, mydirectory, l_files):
+        """
+        :param mydirectory: (str) path to the directory
+        :param l_files: (list) a list of files, relative to the directory
+        :returns: (list) the files which don't exist (without duplicates, in order)
+        :rtype: list
+        """
+
+        return [i for i in dict.fromkeys(l_files) if not self.exists(mydirectory, i)]
+
+    def gethash(self, mydirectory, myfile):
+        """
+        :param mydirectory: (str) path to the directory
+        :param myfile: (str) the file, relative to the directory
+        :returns: (str) the sha256 hash of the file's content ('' if it doesn't exist)
+        :rtype: str
+        """
+
+        entry = self.getentry(mydirectory, myfile)
+
+        if entry is None:
+            return ''
+
+        if not entry[2]:
+            h = hashlib.sha256()
+            with open(os.path.join(mydirectory, myfile), 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+            entry[2] = h.hexdigest()
+
+        return entry[2]
+
+    def changed(self, mydirectory, myfile):
+        """
+        :param mydirectory: (str) path to the directory
+        :param myfile: (str) the file, relative to the directory
+        :returns: (bool) True if the file is new, changed, or gone since the previous run
+        :rtype: bool
+        """
+
+        mydirectory, myname = os.path.split(os.path.normpath(os.path.join(mydirectory, myfile)))
+
+        old = self.d_prev.get(mydirectory, dict()).get(myname)
+        new = self.scan(mydirectory).get(myname)
+
+        if old is None or new is None:
+            return old is not new
+
+        return old[:2] != new[:2]
@@ -39,14 +39,9 @@ if [ "${clean}" == "clean" ]; then
     rm -r ${outputdir}/*
 fi
 
-echo "*** Copy static assets, etc ***"
+echo "*** Copy static assets, etc, and build webpage ***"
 echo
-${scripts}/add_assets.sh ${datadir} ${outputdir} ${scripts}
-echo
-
-echo "*** Build webpage ***"
-echo
-python ${scripts}/jinjagen.py -t ${scripts}/../templates -d ${datadir} -o ${outputdir} --logfile ${logfile}
+python ${scripts}/jinjagen.py -t ${scripts}/../templates -d ${datadir} -o ${outputdir} --logfile ${logfile} --assets
 echo
 
 if [ "${synctoaws}" == "sync" ]; then
@@ -0,0 +1,112 @@
+#-------------------------------------------------------------------------------
+#
+#    bundle.py
+#
+#    Bundle the CSS (and JS) files of each page into a single file.
+#    Pages link BASE_CSS plus their type-specific and url key-specific CSS,
+#    so there are only a few distinct combinations across the whole site:
+#    each combination is concatenated (and minified) once, into a bundle
+#    named by a hash of its parts (e.g., static/bundles/3f2a9c0b1d4e.css),
+#    and each page links one bundle per kind rather than several files
+#
+#-------------------------------------------------------------------------------
+
+import os
+import hashlib
+import minify
+
+# The directory of the bundles, in the output directory
+BUNDLEDIR = 'static/bundles'
+
+# The number of hex digits of the hash in bundle names
+HASHLEN = 12
+
+def getbundlename(outputdir, l_files, kind, assets):
+    """
+    :param outputdir: (str) path to the output directory
+    :param l_files: (list) the files of the bundle (paths in the output directory)
+    :param kind: (str) "css" or "js"
+    :param assets: (AssetIndex) the asset index
+    :returns: (str) the bundle (path in the output directory), named by
+        a hash of the files and their content, so it changes when they do
+    :rtype: str
+    """
+
+    h = hashlib.sha256()
+
+    for i in l_files:
+        h.update(f"{i}:{assets.gethash(outputdir, i.lstrip('/'))}\n".encode())
+
+    return f'{BUNDLEDIR}/{h.hexdigest()[:HASHLEN]}.{kind}'
+
+def writebundle(outputdir, l_files, kind, bundlefile):
+    """
+    Concatenate the files of a bundle (minifying CSS)
+
+    :param outputdir: (str) path to the output directory
+    :param l_files: (list) the files of the bundle (paths in the output directory)
+    :param kind: (str) "css" or "js"
+    :param bundlefile: (str) the bundle (path in the output directory)
+    """
+
+    l_parts = []
+
+    for i in l_files:
+        with open(f"{outputdir}/{i.lstrip('/')}", 'r') as f:
+            l_parts.append(f.read())
+
+    if kind == 'css':
+        mycontent = minify.minifycss('\n'.join(l_parts))
+    else:
+        # Separate the scripts, in case one doesn't end with a semicolon
+        mycontent = '\n;\n'.join(l_parts)
+
+    os.makedirs(f'{outputdir}/{BUNDLEDIR}', exist_ok=True)
+    with open(f'{outputdir}/{bundlefile}.tmp', 'w') as f:
+        f.write(mycontent)
+    os.replace(f'{outputdir}/{bundlefile}.tmp', f'{outputdir}/{bundlefile}')
+
+def createbundles(outputdir, d_combos, assets, verbose=False):
+    """
+    Create a bundle for each distinct combination of CSS (or JS) files,
+    and remove bundles which are no longer used
+
+    :param outputdir: (str) path to the output directory
+    :param d_combos: (dict) a dict whose keys are "css" and "js" and whose values are
+        sets of combinations (tuples of files, as linked by pages)
+    :param assets: (AssetIndex) the asset index
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) a dict whose keys are "css" and "js" and whose values are
+        dicts mapping combinations to bundles (paths in the output directory)
+    :rtype: dict
+    """
+
+    d_bundles = dict()
+    numcreated = 0
+
+    for kind, s_combos in d_combos.items():
+        d_bundles[kind] = dict()
+        for combo in sorted(s_combos):
+            if not combo:
+                continue
+            bundlefile = getbundlename(outputdir, combo, kind, assets)
+            if not assets.exists(outputdir, bundlefile):
+                if verbose:
+                    print(f'Bundling {list(combo)} -> {bundlefile}')
+                writebundle(outputdir, combo, kind, bundlefile)
+                assets.setentry(outputdir, bundlefile)
+                numcreated += 1
+            d_bundles[kind][combo] = bundlefile
+
+    # Remove old bundles
+    s_bundles = set([j for i in d_bundles.values() for j in i.values()])
+    for i in list(assets.scan(f'{outputdir}/{BUNDLEDIR}')):
+        if f'{BUNDLEDIR}/{i}' not in s_bundles:
+            if verbose:
+                print(f'Removing old bundle: {BUNDLEDIR}/{i}')
+            os.remove(f'{outputdir}/{BUNDLEDIR}/{i}')
+            del assets.scan(f'{outputdir}/{BUNDLEDIR}')[i]
+
+    print(f'Bundles: {len(s_bundles)} ({numcreated} new)')
+
+    return d_bundles
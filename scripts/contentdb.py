@@ -0,0 +1,318 @@
+#-------------------------------------------------------------------------------
+#
+#    contentdb.py
+#
+#    An SQLite content store: an alternative to the content json files
+#    (content.sections.json, content.visual.json, content.article.json).
+#    To use it, set CONTENTDB in dataconfig.py (e.g., CONTENTDB = 'content.db').
+#
+#    Import the content json files of a data directory into a database:
+#
+#        python scripts/contentdb.py import -d /path/to/datafolder
+#
+#    Export the database back to the content json files:
+#
+#        python scripts/contentdb.py export -d /path/to/datafolder
+#
+#-------------------------------------------------------------------------------
+
+import os
+import argparse
+import json
+import sqlite3
+import validate
+
+from siteconfig import REQUIRED_POST_FIELDS
+from siteconfig import REQUIRED_SECTION_FIELDS
+
+# A dict whose keys are table names and whose values are
+# the content json file and the fields (columns) of the table
+d_TABLES = {
+    'sections': ('content.sections.json', REQUIRED_SECTION_FIELDS),
+    'visual': ('content.visual.json', REQUIRED_POST_FIELDS),
+    'article': ('content.article.json', REQUIRED_POST_FIELDS)
+}
+
+# The default name of the database, in the data directory
+DEFAULT_DB = 'content.db'
+
+#-------------------------------------------------------------------------------
+#
+#    Schema
+#
+#-------------------------------------------------------------------------------
+
+def createschema(conn):
+    """
+    Create the tables and indexes.
+
+    Each page object is a row. Its position in the content json file is kept
+    (the order matters, e.g., for category pages), fields which aren't
+    required fields go in the "extra" column (as json), and missing fields are NULL.
+    The columns have no type, so values keep their type (e.g., 1 vs "1").
+    The categories of posts (e.g., "travel, food") are also split into
+    a table of their own, so posts can be looked up by category
+
+    :param conn: (sqlite3.Connection) the database connection
+    """
+
+    for table, (_, l_fields) in d_TABLES.items():
+        columns = ', '.join([f'"{i}"' for i in l_fields])
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (position INTEGER PRIMARY KEY, {columns}, extra TEXT)')
+        for i in ['url', 'category', 'date', 'publish', 'selected']:
+            if i in l_fields:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{i} ON {table} ("{i}")')
+
+        # One row per (post, category)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table}_category (position INTEGER, catidx INTEGER, category, PRIMARY KEY (position, catidx))')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_category_category ON {table}_category (category, position)')
+
+def connect(dbpath):
+    """
+    :param dbpath: (str) path to the database
+    :returns: a connection to the database (the tables are created if need be)
+    :rtype: sqlite3.Connection
+    """
+
+    conn = sqlite3.connect(dbpath)
+    createschema(conn)
+
+    # isdate(date): whether a post date is valid, as in the content json (see getfeed())
+    conn.create_function('isdate', 1, lambda x: validate.parsedate(x) is not None, deterministic=True)
+
+    return conn
+
+def splitcategory(mycategory):
+    """
+    Split a category attribute (e.g., "travel, food") the way jinjagen.py does
+
+    :param mycategory: (str) the category attribute
+    :returns: (list) the categories
+    :rtype: list
+    """
+
+    if not mycategory:
+        return []
+
+    return [k.strip() for k in mycategory.split(',')]
+
+#-------------------------------------------------------------------------------
+#
+#    Reading and writing page objects
+#
+#-------------------------------------------------------------------------------
+
+def writetable(conn, table, mycontentjson):
+    """
+    Replace the page objects in a table
+
+    :param conn: (sqlite3.Connection) the database connection
+    :param table: (str) the table (sections, visual, or article)
+    :param mycontentjson: (list of dicts) the page objects
+    """
+
+    l_fields = d_TABLES[table][1]
+    s_fields = set(l_fields)
+
+    conn.execute(f'DELETE FROM {table}')
+    conn.execute(f'DELETE FROM {table}_category')
+
+    l_rows = []
+    l_categoryrows = []
+    for position, i in enumerate(mycontentjson):
+        d_extra = {k: v for k, v in i.items() if k not in s_fields}
+        l_rows.append([position] + [i.get(k) for k in l_fields] + [json.dumps(d_extra) if d_extra else None])
+        for catidx, mycategory in enumerate(splitcategory(i.get('category'))):
+            l_categoryrows.append([position, catidx, mycategory])
+
+    placeholders = ', '.join(['?'] * (len(l_fields) + 2))
+    conn.executemany(f'INSERT INTO {table} VALUES ({placeholders})', l_rows)
+    conn.executemany(f'INSERT INTO {table}_category VALUES (?, ?, ?)', l_categoryrows)
+
+def readtable(conn, table):
+    """
+    Read the page objects in a table, in order
+
+    :param conn: (sqlite3.Connection) the database connection
+    :param table: (str) the table (sections, visual, or article)
+    :returns: (list of dicts) the page objects, as they'd be read from the content json
+    :rtype: list
+    """
+
+    l_fields = d_TABLES[table][1]
+
+    l = []
+
+    for row in conn.execute(f'SELECT * FROM {table} ORDER BY position'):
+        # Skip position (the first column); missing fields are NULL
+        d_page = {k: v for k, v in zip(l_fields, row[1:-1]) if v is not None}
+        if row[-1]:
+            d_page.update(json.loads(row[-1]))
+        l.append(d_page)
+
+    return l
+
+def readcontent(conn):
+    """
+    :param conn: (sqlite3.Connection) the database connection
+    :returns: (tuple) the sections, visual posts, and article posts (lists of dicts)
+    :rtype: tuple
+    """
+
+    return readtable(conn, 'sections'), readtable(conn, 'visual'), readtable(conn, 'article')
+
+#-------------------------------------------------------------------------------
+#
+#    Queries
+#
+#    These return the url keys of published posts, in the same order
+#    as the corresponding functions in jinjagen.py
+#
+#-------------------------------------------------------------------------------
+
+def getfeed(conn, table, numposts):
+    """
+    Get the most recent posts (see jinjagen.createfeed())
+
+    :param conn: (sqlite3.Connection) the database connection
+    :param table: (str) the table (visual or article)
+    :param numposts: (int) the number of posts
+    :returns: (list) the url keys of the posts, newest first
+    :rtype: list
+    """
+
+    # Only posts whose date parses, as in jinjagen.createfeed()
+    # (dates of the form YYYY-MM-DD sort as strings as they do as dates).
+    # Ties are in order of position, as with a stable sort
+    return [i[0] for i in conn.execute(
+        f'SELECT url FROM {table} '
+        'WHERE publish AND NOT specialpage AND isdate(date) '
+        'ORDER BY date DESC, position LIMIT ?',
+        (max(numposts, 0),)
+    )]
+
+def getselected(conn, table):
+    """
+    Get the selected posts
+
+    :param conn: (sqlite3.Connection) the database connection
+    :param table: (str) the table (visual or article)
+    :returns: (list) the url keys of the posts
+    :rtype: list
+    """
+
+    return [i[0] for i in conn.execute(
+        f'SELECT url FROM {table} WHERE publish AND selected ORDER BY position'
+    )]
+
+def getcategories(conn, table):
+    """
+    Get the posts in each category (see jinjagen.createcategorydict())
+
+    :param conn: (sqlite3.Connection) the database connection
+    :param table: (str) the table (visual or article)
+    :returns: (dict) a dict whose keys are categories (in order of first appearance)
+        and whose values are lists of url keys
+    :rtype: dict
+    """
+
+    l_categories = [i[0] for i in conn.execute(
+        f'SELECT c.category FROM {table}_category c JOIN {table} p ON p.position = c.position '
+        'WHERE p.publish AND NOT p.specialpage '
+        # I.e., order by the first (position, catidx) in which the category appears
+        'GROUP BY c.category ORDER BY MIN(c.position * 1000000 + c.catidx)'
+    )]
+
+    res = dict()
+
+    for mycategory in l_categories:
+        res[mycategory] = [i[0] for i in conn.execute(
+            f'SELECT p.url FROM {table}_category c JOIN {table} p ON p.position = c.position '
+            'WHERE c.category = ? AND p.publish AND NOT p.specialpage ORDER BY c.position',
+            (mycategory,)
+        )]
+
+    return res
+
+#-------------------------------------------------------------------------------
+#
+#    Import and export
+#
+#-------------------------------------------------------------------------------
+
+def importjson(datadir, dbpath):
+    """
+    Import the content json files of a data directory into a database
+
+    :param datadir: (str) path to the data directory
+    :param dbpath: (str) path to the database
+    """
+
+    conn = connect(dbpath)
+
+    with conn:
+        for table, (myfile, _) in d_TABLES.items():
+            with open(f'{datadir}/{myfile}', 'r') as f:
+                mycontentjson = json.load(f)
+            writetable(conn, table, mycontentjson)
+            print(f'Imported {len(mycontentjson)} page objects from {myfile}')
+
+    conn.close()
+
+def exportjson(dbpath, datadir):
+    """
+    Export a database to the content json files of a data directory
+
+    :param dbpath: (str) path to the database
+    :param datadir: (str) path to the data directory
+    """
+
+    conn = connect(dbpath)
+
+    for table, (myfile, _) in d_TABLES.items():
+        mycontentjson = readtable(conn, table)
+        with open(f'{datadir}/{myfile}', 'w') as f:
+            json.dump(mycontentjson, f, indent=4, ensure_ascii=False)
+            f.write('\n')
+        print(f'Exported {len(mycontentjson)} page objects to {myfile}')
+
+    conn.close()
+
+def getarg():
+    """
+    Set up arguments
+    """
+
+    parser = argparse.ArgumentParser(prog='contentdb',
+                                     usage='%(prog)s {import,export} [options]',
+                                     add_help=False,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-h', '--help',
+                        action = 'help',
+                        help='show this help message and exit\n\n')
+    parser.add_argument('action',
+                        choices=['import', 'export'],
+                        help='import: content json files -> database\nexport: database -> content json files\n\n')
+    parser.add_argument('-d', '--data',
+                        type=str,
+                        required=True,
+                        help='Path to the data folder\n\n')
+    parser.add_argument('--db',
+                        type=str,
+                        default=DEFAULT_DB,
+                        help=f'Path to the database, relative to the data folder (default: {DEFAULT_DB})\n\n')
+
+    args =  parser.parse_args()
+
+    return args
+
+if __name__ == "__main__":
+
+    args = getarg()
+
+    dbpath = os.path.join(args.data, args.db)
+
+    if args.action == 'import':
+        importjson(args.data, dbpath)
+    else:
+        exportjson(dbpath, args.data)
@@ -0,0 +1,154 @@
+#-------------------------------------------------------------------------------
+#
+#    criticalcss.py
+#
+#    Get the critical CSS of a template: the CSS rules needed to render
+#    the template's own markup (its nav, header, footer, and the skeleton of
+#    its content), which is what shows first. Pages inline it in <head>
+#    and load the full stylesheets asynchronously, so the stylesheets
+#    don't block rendering. There's no browser to lay pages out here,
+#    so "above the fold" is approximated by the template's markup:
+#    content the template pulls in (e.g., an article's content.html) isn't critical.
+#    The critical CSS depends on the template and the CSS only, so it's computed
+#    once per template (and set of stylesheets), and cached between builds
+#
+#-------------------------------------------------------------------------------
+
+import os
+import json
+import hashlib
+import minify
+import prunecss
+
+def walkmarkup(env, l_nodes, d_blocks):
+    """
+    Get the markup (the literal HTML) of a list of template nodes, in order.
+    Both branches of an if, and the body of a for (once), are included.
+    Expressions are left out
+
+    :param env: a jinja2 Environment object
+    :param l_nodes: (list) the nodes
+    :param d_blocks: (dict) a dict whose keys are block names and whose values
+        are the Block nodes to use (i.e., the ones of the child template)
+    :returns: (list) the pieces of markup
+    :rtype: list
+    """
+
+    from jinja2 import nodes
+
+    l = []
+
+    for node in l_nodes:
+        if isinstance(node, nodes.TemplateData):
+            l.append(node.data)
+        elif isinstance(node, nodes.Output):
+            l.extend(walkmarkup(env, node.nodes, d_blocks))
+        elif isinstance(node, nodes.Block):
+            l.extend(walkmarkup(env, d_blocks.get(node.name, node).body, d_blocks))
+        elif isinstance(node, nodes.Include):
+            if isinstance(node.template, nodes.Const):
+                l.append(gettemplatemarkup(env, node.template.value))
+        elif isinstance(node, nodes.Call) and isinstance(node.node, nodes.Name) and node.node.name in ['constant', 'card']:
+            # A site-constant fragment or a post's card (see jinjagen.getconstant(), jinjagen.getcard())
+            if node.args and isinstance(node.args[0], nodes.Const):
+                l.append(gettemplatemarkup(env, node.args[0].value))
+        elif isinstance(node, nodes.If):
+            l.extend(walkmarkup(env, node.body, d_blocks))
+            for i in node.elif_:
+                l.extend(walkmarkup(env, i.body, d_blocks))
+            l.extend(walkmarkup(env, node.else_, d_blocks))
+        elif isinstance(node, nodes.For):
+            l.extend(walkmarkup(env, node.body, d_blocks))
+            l.extend(walkmarkup(env, node.else_, d_blocks))
+        elif isinstance(node, (nodes.Stmt, nodes.Helper)):
+            # E.g., {% autoescape %}, {% with %}, {% filter %}
+            l.extend(walkmarkup(env, [i for i in node.iter_child_nodes() if isinstance(i, (nodes.Stmt, nodes.Output, nodes.Helper))], d_blocks))
+
+    return l
+
+def gettemplatemarkup(env, templatename, d_blocks=None):
+    """
+    Get the markup of a template, with the blocks of its parents
+    and its includes (and constant() and card() fragments) filled in
+
+    :param env: a jinja2 Environment object
+    :param templatename: (str) the template
+    :param d_blocks: (dict) the blocks of its children (used in recursion)
+    :returns: (str) the markup
+    :rtype: str
+    """
+
+    from jinja2 import nodes
+
+    ast = env.parse(env.loader.get_source(env, templatename)[0])
+
+    # A child's blocks override its parent's
+    d_blocks = dict(d_blocks or dict())
+    for i in ast.find_all(nodes.Block):
+        d_blocks.setdefault(i.name, i)
+
+    myextends = ast.find(nodes.Extends)
+    if myextends is not None and isinstance(myextends.template, nodes.Const):
+        return gettemplatemarkup(env, myextends.template.value, d_blocks)
+
+    return ''.join(walkmarkup(env, ast.body, d_blocks))
+
+def getusage(env, templatename):
+    """
+    :param env: a jinja2 Environment object
+    :param templatename: (str) the template
+    :returns: (set) the elements, classes (.name), and ids (#name) in the template's markup
+    :rtype: set
+    """
+
+    parser = prunecss.UsageParser()
+    parser.feed(gettemplatemarkup(env, templatename))
+    parser.close()
+
+    return parser.s_used
+
+def getcriticalcss(env, templatename, l_cssfiles, outputdir, cachedir, key, s_extra=set()):
+    """
+    Get the critical CSS of a template, from the cache if it's there
+
+    :param env: a jinja2 Environment object
+    :param templatename: (str) the template
+    :param l_cssfiles: (list) the page's CSS files (paths in the output directory)
+    :param outputdir: (str) path to the output directory
+    :param cachedir: (str) path to the cache directory
+    :param key: (str) a hash of everything the critical CSS depends on
+        (the template and its parents, the CSS files' content, etc.).
+        If it doesn't match the cached one, the critical CSS is computed again
+    :param s_extra: (set) names to treat as used, in addition to the template's
+        (e.g., classes which are set in dataconfig.py, or added by JS)
+    :returns: (str) the critical CSS (minified)
+    :rtype: str
+    """
+
+    # One cache file per template and set of CSS files
+    myhash = hashlib.sha256(json.dumps(l_cssfiles).encode()).hexdigest()[:12]
+    cachefile = f'{cachedir}/critical/{templatename}.{myhash}.json'
+
+    try:
+        with open(cachefile, 'r') as f:
+            d_cache = json.load(f)
+        if d_cache['key'] == key:
+            return d_cache['css']
+    except:
+        pass
+
+    l_parts = []
+    for i in l_cssfiles:
+        with open(f"{outputdir}/{i.lstrip('/')}", 'r') as f:
+            l_parts.append(f.read())
+
+    mycss = minify.minifycss(prunecss.prune('\n'.join(l_parts), getusage(env, templatename) | s_extra))
+
+    # Write atomically: parallel workers may compute the same critical CSS
+    os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+    tmpfile = f'{cachefile}.{os.getpid()}.tmp'
+    with open(tmpfile, 'w') as f:
+        json.dump({'key': key, 'css': mycss}, f)
+    os.replace(tmpfile, cachefile)
+
+    return mycss
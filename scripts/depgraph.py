@@ -0,0 +1,111 @@
+#-------------------------------------------------------------------------------
+#
+#    depgraph.py
+#
+#    A dependency graph between the output files of the site and
+#    the inputs they're built from, used to decide which pages to rebuild
+#
+#-------------------------------------------------------------------------------
+
+# Inputs are named with strings of the form "kind:name". The kinds are:
+#
+#   page:<url>               a page object
+#   list:<name>              an ordered list of posts, e.g.:
+#                               list:feed_vis, list:selected_vis,
+#                               list:category_vis:<category>, list:category_article:<category>
+#   nav:<flavor>:<url>       the nav arrows of a page (flavor is vis, article, or latest)
+#   template:<name>          a template (including the ones it extends or includes)
+#   file:<path>              a file in the data directory (e.g., an article's content.html)
+#   config:<KEY>             a constant in dataconfig.py
+#   props                    the common props shared by every page (sidebar, css, news, etc.)
+#   assets                   the fingerprinted names of the static assets (see fingerprint.py)
+
+class DepGraph:
+    """
+    A dependency graph: each output file (e.g., post/wine/index.html)
+    depends on a set of inputs. The graph is kept in both directions,
+    so it's quick to ask which outputs depend on a given input
+    """
+
+    def __init__(self):
+        # A dict whose keys are outputs and whose values are sets of inputs
+        self.d_output2inputs = dict()
+        # A dict whose keys are inputs and whose values are sets of outputs
+        self.d_input2outputs = dict()
+
+    @classmethod
+    def frommanifest(cls, d_manifest):
+        """
+        Create the graph from a build manifest, whose entries
+        record the inputs of every output file (the "deps" key)
+
+        :param d_manifest: (dict) a dict whose keys are output files and whose values are manifest entries
+        :returns: the dependency graph
+        :rtype: DepGraph
+        """
+
+        graph = cls()
+
+        for output, d_entry in d_manifest.items():
+            graph.add(output, d_entry.get('deps', []))
+
+        return graph
+
+    def add(self, output, l_inputs):
+        """
+        Add dependencies
+
+        :param output: (str) an output file
+        :param l_inputs: (list) the inputs it depends on
+        """
+
+        self.d_output2inputs.setdefault(output, set()).update(l_inputs)
+
+        for i in l_inputs:
+            self.d_input2outputs.setdefault(i, set()).add(output)
+
+    def inputs(self, output):
+        """
+        :param output: (str) an output file
+        :returns: (set) the inputs the output depends on
+        :rtype: set
+        """
+
+        return self.d_output2inputs.get(output, set())
+
+    def outputs(self, myinput):
+        """
+        :param myinput: (str) an input
+        :returns: (set) the outputs which depend on the input
+        :rtype: set
+        """
+
+        return self.d_input2outputs.get(myinput, set())
+
+    def dirty(self, l_changed):
+        """
+        Answer the question: which outputs are dirty, given these changed inputs?
+
+        :param l_changed: (list) the changed inputs
+        :returns: (set) the outputs which need to be rebuilt
+        :rtype: set
+        """
+
+        res = set()
+
+        for i in l_changed:
+            res.update(self.outputs(i))
+
+        return res
+
+def diffinputs(d_old, d_new):
+    """
+    Compare two snapshots of the inputs
+
+    :param d_old: (dict) a dict whose keys are inputs and whose values are their hashes
+    :param d_new: (dict) ditto, but newer
+    :returns: (list) the inputs which were added, removed, or changed
+    :rtype: list
+    """
+
+    return sorted([i for i in set(d_old) | set(d_new) if d_old.get(i) != d_new.get(i)])
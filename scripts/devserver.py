@@ -0,0 +1,198 @@
+#-------------------------------------------------------------------------------
+#
+#    devserver.py
+#
+#    A development web server for the output directory, which reloads
+#    open browser tabs whenever the site is rebuilt (jinjagen.py --serve),
+#    plus helpers to detect changed files (jinjagen.py --watch)
+#
+#-------------------------------------------------------------------------------
+
+import os
+import functools
+import threading
+import http.server
+
+# The url path of the stream of reload events
+RELOADPATH = '/__ssg_reload'
+
+# The script injected into every HTML page served.
+# It listens for reload events and reloads the page
+RELOADSCRIPT = f"""<script>
+new EventSource("{RELOADPATH}").onmessage = function() {{ location.reload(); }};
+</script>
+"""
+
+#-------------------------------------------------------------------------------
+#
+#    Server
+#
+#-------------------------------------------------------------------------------
+
+class DevServer(http.server.ThreadingHTTPServer):
+    """
+    A threaded HTTP server which keeps track of the number of rebuilds,
+    so request handlers can tell the browser to reload
+    """
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reloadcount = 0
+        self.reloadcondition = threading.Condition()
+
+    def notifyreload(self):
+        """
+        Tell every open browser tab to reload
+        """
+
+        with self.reloadcondition:
+            self.reloadcount += 1
+            self.reloadcondition.notify_all()
+
+class ReloadHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serve the output directory, injecting the reload script into HTML pages
+    and streaming reload events (server-sent events) at RELOADPATH
+    """
+
+    def do_GET(self):
+        if self.path == RELOADPATH:
+            self.sendreloadevents()
+            return
+
+        mypath = self.translate_path(self.path)
+
+        # Directories redirect to a trailing slash (let the parent class do that)
+        if os.path.isdir(mypath) and self.path.split('?')[0].endswith('/'):
+            mypath = os.path.join(mypath, 'index.html')
+
+        if mypath.endswith('.html') and os.path.isfile(mypath):
+            self.sendhtml(mypath)
+        else:
+            super().do_GET()
+
+    def sendhtml(self, mypath):
+        """
+        Send an HTML page with the reload script injected just before </body>
+
+        :param mypath: (str) path to the HTML file
+        """
+
+        with open(mypath, 'rb') as f:
+            mybytes = f.read()
+
+        myscript = RELOADSCRIPT.encode('utf-8')
+        idx = mybytes.rfind(b'</body>')
+        if idx == -1:
+            mybytes = mybytes + myscript
+        else:
+            mybytes = mybytes[:idx] + myscript + mybytes[idx:]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(mybytes)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(mybytes)
+
+    def sendreloadevents(self):
+        """
+        Keep the connection open, and send an event every time the site is rebuilt
+        """
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+
+        server = self.server
+        count = server.reloadcount
+
+        try:
+            while True:
+                with server.reloadcondition:
+                    server.reloadcondition.wait_for(lambda: server.reloadcount != count, timeout=15)
+                if server.reloadcount != count:
+                    count = server.reloadcount
+                    self.wfile.write(b'data: reload\n\n')
+                else:
+                    # A comment, to keep the connection alive
+                    self.wfile.write(b': ping\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        # Quiet: the console is for build messages
+        pass
+
+def startserver(outputdir, port=8000):
+    """
+    Start the development server in a background thread
+
+    :param outputdir: (str) path to the output directory
+    :param port: (int) the port
+    :returns: the server (call notifyreload() on it after every rebuild)
+    :rtype: DevServer
+    """
+
+    handler = functools.partial(ReloadHandler, directory=outputdir)
+    server = DevServer(('', port), handler)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    print(f'Serving {outputdir} at http://localhost:{port}/')
+
+    return server
+
+#-------------------------------------------------------------------------------
+#
+#    Watching
+#
+#-------------------------------------------------------------------------------
+
+def scanfiles(l_paths):
+    """
+    Get the modification times of a list of files and
+    (recursively) of the files in a list of directories.
+    Hidden files and directories are ignored
+
+    :param l_paths: (list) a list of files and directories
+    :returns: (dict) a dict whose keys are file paths and whose values are modification times
+    :rtype: dict
+    """
+
+    d_mtimes = dict()
+
+    for mypath in l_paths:
+        if os.path.isfile(mypath):
+            d_mtimes[mypath] = os.stat(mypath).st_mtime_ns
+            continue
+        for mydir, l_dirs, l_files in os.walk(mypath):
+            l_dirs[:] = [i for i in l_dirs if not i.startswith('.')]
+            for i in l_files:
+                if i.startswith('.'):
+                    continue
+                myfile = f'{mydir}/{i}'
+                try:
+                    d_mtimes[myfile] = os.stat(myfile).st_mtime_ns
+                except OSError:
+                    # Deleted while scanning
+                    pass
+
+    return d_mtimes
+
+def changedfiles(d_old, d_new):
+    """
+    Compare two scans from scanfiles()
+
+    :param d_old: (dict) the old scan
+    :param d_new: (dict) the new scan
+    :returns: (list) the files which were added, removed, or modified
+    :rtype: list
+    """
+
+    return sorted([i for i in set(d_old) | set(d_new) if d_old.get(i) != d_new.get(i)])
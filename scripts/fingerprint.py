@@ -0,0 +1,175 @@
+#-------------------------------------------------------------------------------
+#
+#    fingerprint.py
+#
+#    Fingerprint the static assets: give each file in the output directory's
+#    static/ folder a copy whose name contains a hash of its content
+#    (e.g., static/css/theme.min.css -> static/css/theme.min.3f2a9c0b1d4e.css).
+#    Since the name changes whenever the content does, fingerprinted files
+#    can be cached forever. Pages link to them via the asset() template helper.
+#    Also write a cache policy for every output file (see writecachepolicy())
+#
+#-------------------------------------------------------------------------------
+
+import os
+import re
+import json
+import shutil
+
+from siteconfig import d_CACHECONTROL
+from siteconfig import FINGERPRINTED
+
+# The number of hex digits of the hash in fingerprinted file names
+HASHLEN = 12
+
+# A fingerprinted file name: name.<hash>.ext
+FINGERPRINTED_RE = re.compile(r'.+\.[0-9a-f]{%d}\.[^./]+$' % HASHLEN)
+
+def getfingerprintedname(myfile, myhash):
+    """
+    :param myfile: (str) a file (e.g., static/css/theme.min.css)
+    :param myhash: (str) the hash of its content
+    :returns: (str) the fingerprinted file (e.g., static/css/theme.min.3f2a9c0b1d4e.css)
+    :rtype: str
+    """
+
+    base, ext = os.path.splitext(myfile)
+
+    return f'{base}.{myhash[:HASHLEN]}{ext}'
+
+def isfingerprinted(staticdir, myfile, assets):
+    """
+    :param staticdir: (str) path to the static directory
+    :param myfile: (str) a file in it
+    :param assets: (AssetIndex) the asset index
+    :returns: (bool) True if the file is named by a hash of its own content
+        (i.e., it's a fingerprinted copy, although maybe not one in the record)
+    :rtype: bool
+    """
+
+    if not FINGERPRINTED_RE.match(myfile):
+        return False
+
+    return os.path.splitext(myfile)[0].endswith('.' + assets.gethash(staticdir, myfile)[:HASHLEN])
+
+def fingerprintassets(outputdir, assets, cachedir, verbose=False):
+    """
+    Create the fingerprinted copies (hardlinks, where possible) of the files in static/,
+    and remove the old ones. The copies created are kept in a record,
+    so only those are ever removed: a file which merely looks fingerprinted
+    (e.g., a copied photo.1a2b3c4d5e6f.jpg) is an ordinary asset
+
+    :param outputdir: (str) path to the output directory
+    :param assets: (AssetIndex) the asset index
+    :param cachedir: (str) path to the cache directory
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) a dict whose keys are asset paths (e.g., static/css/theme.min.css)
+        and whose values are the fingerprinted paths
+    :rtype: dict
+    """
+
+    staticdir = f'{outputdir}/static'
+
+    # The fingerprinted copies created by previous builds (paths in the output directory)
+    recordfile = f'{cachedir}/{FINGERPRINTED}'
+    try:
+        with open(recordfile, 'r') as f:
+            s_previous = set(json.load(f))
+    except:
+        s_previous = set()
+
+    # Bundles are already named by a hash of their content (see bundle.py)
+    l_files = [i for i in assets.listfiles(staticdir) if not i.startswith('bundles/')]
+
+    # Don't fingerprint fingerprinted copies: the recorded ones, and
+    # (e.g., if the cache directory was removed) files named by a hash of their own content
+    d_assetmap = dict()
+    for myfile in l_files:
+        if f'static/{myfile}' not in s_previous and not isfingerprinted(staticdir, myfile, assets):
+            d_assetmap[f'static/{myfile}'] = 'static/' + getfingerprintedname(myfile, assets.gethash(staticdir, myfile))
+
+    # Remove the recorded copies of old versions
+    s_fingerprinted = set(d_assetmap.values())
+    for myfile in l_files:
+        if f'static/{myfile}' in s_previous and f'static/{myfile}' not in s_fingerprinted:
+            if verbose:
+                print(f'Removing old fingerprinted file: {staticdir}/{myfile}')
+            os.remove(f'{staticdir}/{myfile}')
+
+    # Record the new copies before creating them, so they can be removed later
+    # even if this build stops halfway
+    os.makedirs(cachedir, exist_ok=True)
+    with open(recordfile, 'w') as f:
+        json.dump(sorted(s_fingerprinted), f)
+
+    # Create the new ones
+    numcreated = 0
+    for src, dst in d_assetmap.items():
+        if assets.exists(outputdir, dst):
+            continue
+        if verbose:
+            print(f'Fingerprinting: {src} -> {dst}')
+        try:
+            os.link(f'{outputdir}/{src}', f'{outputdir}/{dst}')
+        except OSError:
+            shutil.copy2(f'{outputdir}/{src}', f'{outputdir}/{dst}')
+        assets.setentry(outputdir, dst, assets.gethash(outputdir, src))
+        numcreated += 1
+
+    print(f'Fingerprinted assets: {len(d_assetmap)} ({numcreated} new)')
+
+    return d_assetmap
+
+def getcachepolicy(d_assetmap, l_htmlfiles):
+    """
+    Get the Cache-Control header of every output file: fingerprinted assets
+    are immutable, HTML pages are short-lived, and other assets are in between
+
+    :param d_assetmap: (dict) the asset map (see fingerprintassets())
+    :param l_htmlfiles: (list) the HTML files (e.g., post/wine/index.html)
+    :returns: (dict) a dict whose keys are output files and whose values are Cache-Control headers
+    :rtype: dict
+    """
+
+    d_policy = dict()
+
+    for i in sorted(l_htmlfiles):
+        d_policy[i] = d_CACHECONTROL['html']
+    for k, v in sorted(d_assetmap.items()):
+        d_policy[k] = d_CACHECONTROL['asset']
+        d_policy[v] = d_CACHECONTROL['immutable']
+
+    return d_policy
+
+def geturlpath(myfile):
+    """
+    :param myfile: (str) an output file (e.g., post/wine/index.html)
+    :returns: (str) the URL path it's served at (e.g., /post/wine/)
+    :rtype: str
+    """
+
+    if myfile == 'index.html':
+        return '/'
+
+    if myfile.endswith('/index.html'):
+        return '/' + myfile[:-len('index.html')]
+
+    return '/' + myfile
+
+def writecachepolicy(outputdir, policyfile, d_policy):
+    """
+    Write the cache policy twice: as json (a dict mapping output files, i.e., S3 object keys,
+    to Cache-Control headers), and as a _headers file
+    (the format used by, e.g., Netlify and Cloudflare Pages)
+
+    :param outputdir: (str) path to the output directory
+    :param policyfile: (str) the json file, relative to the output directory
+    :param d_policy: (dict) the cache policy (see getcachepolicy())
+    """
+
+    with open(f'{outputdir}/{policyfile}', 'w') as f:
+        json.dump(d_policy, f, indent=4)
+
+    with open(f'{outputdir}/_headers', 'w') as f:
+        for k, v in d_policy.items():
+            f.write(f'{geturlpath(k)}\n  Cache-Control: {v}\n')
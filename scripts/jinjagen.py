@@ -6,23 +6,42 @@
 #
 #-------------------------------------------------------------------------------
 
+import time
+
+# When the script started (see --timings)
+T_START = time.perf_counter()
+
 import sys
 import os
 import argparse
 import json
-import jinja2
+import hashlib
 import datetime
-import pandas as pd
+import collections
+import types
 import colorme as color
+import validate
+import pageobject
+import assetindex
+import minify
+
+# Note: heavier modules (jinja2, multiprocessing, csv, etc.) are imported
+# in the functions which use them, so startup stays fast
 
 # Constants from config file
 
 from siteconfig import VERSION
-from siteconfig import RESERVED
-from siteconfig import ALLOWED_TYPES
 from siteconfig import ALLOWED_SOCIAL
-from siteconfig import REQUIRED_POST_FIELDS
-from siteconfig import REQUIRED_SECTION_FIELDS
+from siteconfig import MANIFEST
+from siteconfig import CACHEDIR
+from siteconfig import SNAPSHOT
+from siteconfig import ASSETINDEX
+from siteconfig import MINIFIED
+from siteconfig import CSSUSAGE
+from siteconfig import SOCIALSPRITE_FILE
+from siteconfig import ALLOWED_DUPLICATES
+from siteconfig import ALIAS_TEMPLATE
+from siteconfig import CACHEPOLICY
 
 #-------------------------------------------------------------------------------
 #
@@ -35,9 +54,116 @@ from siteconfig import REQUIRED_SECTION_FIELDS
 # A "json"-like list (a list of dicts) of "log" information
 l_log_global = []
 
+# The columns of the log file
+LOG_COLUMNS = ['name', 'urlpath', 'urlkey', 'type', 'marker', 'template', 'directory', 'css', 'js']
+
+# The buffer size (in bytes) for writing pages (see writepage())
+WRITEBUFFER = 1 << 16
+
+# A list of [phase, seconds] pairs: how long each phase of the build took (see --timings)
+l_timings_global = []
+
+# The build manifest for this build: a dict whose keys are output files
+# (relative to the output directory) and whose values are hashes of the
+# inputs (page object, props, templates, content) that produced them
+d_manifest_global = dict()
+
+# The build manifest from the previous build
+# If a page's input hash matches its entry here, the page is skipped
+d_manifest_prev_global = dict()
+
+# A dict whose keys are template names and whose values are
+# hashes of the template plus every template it extends or includes
+d_templatehash_global = dict()
+
+# A dict whose keys are template names and whose values are lists of
+# the template plus every template it extends or includes
+d_templatechain_global = dict()
+
+# A dict whose keys are template names and whose values are the fragments
+# rendered by the constant() template helper (rendered once per build)
+d_constant_global = dict()
+
+# A dict whose keys are hashes of a card's inputs (the fragment, the post, and the variant)
+# and whose values are the cards rendered by the card() template helper (see getcard())
+d_card_global = dict()
+
+# A dict whose keys are hashes of the inputs of a template's critical CSS
+# and whose values are the critical CSS (see getcriticalcss())
+d_criticalcss_global = dict()
+
+# A dict whose keys are template paths and whose values are jinja2 envs
+# The env is created once per build, so each template is loaded and compiled once
+d_env_global = dict()
+
+# If True, ignore the previous build manifest and rebuild every page
+FORCE = False
+
+# The read-only data structures shared by every page (common props, category dicts,
+# nav dicts, feeds, paths, etc.). In a parallel build, each worker process
+# receives these once, when it starts, rather than once per page
+d_shared_global = dict()
+
 # url key to debug
 DEBUG = 'XXX'
 
+# The constants in dataconfig.py (see setupglobals())
+CONFIG_KEYS = [
+    'SITETITLE',
+    'DOMAIN',
+    'HOMEPAGE',
+    'HOMELINK',
+    'SITEWORDS',
+    'SITEAUTHOR',
+    'EMAIL',
+    'FAVICON',
+    'AVATAR',
+    'NUMPOSTSFEED',
+    'SHOWNEWS',
+    'DUPLICATEHOME',
+    'LATESTFEED',
+    'SIDEBAR',
+    'd_SOCIALMEDIA',
+    'BASE_JS',
+    'd_TYPE2JS',
+    'd_URL2JS',
+    'BASE_CSS',
+    'd_TYPE2CSS',
+    'd_URL2CSS',
+    'd_CSS',
+    'd_TYPE2TEMPLATE',
+    'l_SPECIAL_PAGES',
+    'PAGESIZE',
+    'd_URL2PAGESIZE',
+    'CONTENTDB',
+    'FINGERPRINT',
+    'BUNDLE',
+    'PRUNECSS',
+    'l_CSS_ALLOWLIST',
+    'CRITICALCSS',
+    'KEEPBANNER',
+    'SOCIALSPRITE',
+    'DUPLICATES'
+]
+
+# The constants in dataconfig.py which change how pages are rendered (see renderpage()),
+# rather than what goes in them. Every page depends on them
+RENDER_CONFIG_KEYS = [
+    'KEEPBANNER'
+]
+
+# The constants in dataconfig.py which the content data structures depend on
+# (see createcontent()). If one changes, the content snapshot is out of date
+SNAPSHOT_CONFIG_KEYS = [
+    'HOMEPAGE',
+    'NUMPOSTSFEED',
+    'LATESTFEED',
+    'l_SPECIAL_PAGES',
+    'PAGESIZE',
+    'd_URL2PAGESIZE',
+    'CONTENTDB'
+]
+
 #-------------------------------------------------------------------------------
 #
 #    Functions
@@ -70,10 +196,46 @@ def getarg():
     parser.add_argument('--logfile',
                         type=str,
                         help='Path to the log folder (omit to suppress logging)\n\n')
+    parser.add_argument('--assets',
+                        action="store_true",
+                        default=False,
+                        help='Before building, minify and copy the static assets\n(CSS, JS, imgs, videos) to the output directory\n\n')
+    parser.add_argument('--static',
+                        type=str,
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static'),
+                        help='Path to the static CSS and JS folder, for --assets\n(default: the static folder of this repository)\n\n')
+    parser.add_argument('--hardlink',
+                        action="store_true",
+                        default=False,
+                        help='With --assets, hardlink imgs and videos rather than copy them\n\n')
     parser.add_argument('--nostrict',
                         action="store_true",
                         default=False,
                         help='Turn off strict mode\n\n')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        default=1,
+                        help='Number of processes used to render pages (default: 1)\n\n')
+    parser.add_argument('--watch',
+                        action="store_true",
+                        default=False,
+                        help='After building, watch for changes and rebuild\n\n')
+    parser.add_argument('--serve',
+                        action="store_true",
+                        default=False,
+                        help='Watch, and also serve the output directory,\nreloading the browser after every rebuild\n\n')
+    parser.add_argument('--port',
+                        type=int,
+                        default=8000,
+                        help='Port for --serve (default: 8000)\n\n')
+    parser.add_argument('--timings',
+                        action="store_true",
+                        default=False,
+                        help='Print how long startup and each phase of the build took\n\n')
+    parser.add_argument('--force',
+                        action="store_true",
+                        default=False,
+                        help='Ignore the build manifest and rebuild every page\n\n')
     parser.add_argument('-v', '--verbose',
                         action="store_true",
                         default=False,
@@ -116,6 +278,17 @@ def setupglobals(verbose=False):
     global d_CSS
     global d_TYPE2TEMPLATE
     global l_SPECIAL_PAGES
+    global PAGESIZE
+    global d_URL2PAGESIZE
+    global CONTENTDB
+    global FINGERPRINT
+    global BUNDLE
+    global PRUNECSS
+    global l_CSS_ALLOWLIST
+    global CRITICALCSS
+    global KEEPBANNER
+    global SOCIALSPRITE
+    global DUPLICATES
 
     # If these are missing, it's no big deal
     SITEWORDS = ''
@@ -168,6 +341,61 @@ def setupglobals(verbose=False):
         from dataconfig import HOMELINK
     except:
         pass
+    PAGESIZE = 0
+    try:
+        from dataconfig import PAGESIZE
+    except:
+        pass
+    d_URL2PAGESIZE = dict()
+    try:
+        from dataconfig import d_URL2PAGESIZE
+    except:
+        pass
+    CONTENTDB = ''
+    try:
+        from dataconfig import CONTENTDB
+    except:
+        pass
+    FINGERPRINT = False
+    try:
+        from dataconfig import FINGERPRINT
+    except:
+        pass
+    BUNDLE = False
+    try:
+        from dataconfig import BUNDLE
+    except:
+        pass
+    PRUNECSS = False
+    try:
+        from dataconfig import PRUNECSS
+    except:
+        pass
+    l_CSS_ALLOWLIST = []
+    try:
+        from dataconfig import l_CSS_ALLOWLIST
+    except:
+        pass
+    CRITICALCSS = False
+    try:
+        from dataconfig import CRITICALCSS
+    except:
+        pass
+    KEEPBANNER = True
+    try:
+        from dataconfig import KEEPBANNER
+    except:
+        pass
+    SOCIALSPRITE = False
+    try:
+        from dataconfig import SOCIALSPRITE
+    except:
+        pass
+    DUPLICATES = 'copy'
+    try:
+        from dataconfig import DUPLICATES
+    except:
+        pass
 
     # These are necessary
     from dataconfig import SITETITLE
@@ -194,7 +422,14 @@ def setupglobals(verbose=False):
         print(f'keywords: {SITEWORDS}')
         # print(f'email: {EMAIL}')
         print(f'Create Latest Feed: {LATESTFEED}')
+        print(f'Duplicate pages: {DUPLICATES}')
         print(f'Sidebar: {SIDEBAR}')
+        if CONTENTDB:
+            print(f'Content database: {CONTENTDB}')
+        print(f'Posts per section page: {PAGESIZE if PAGESIZE else "all"}')
+        if d_URL2PAGESIZE:
+            print('url key specific posts per section page:')
+            print(json.dumps(d_URL2PAGESIZE, indent=4))
         print(f'Favicon: {FAVICON}')
         print(f'Avatar: {AVATAR}')
         print(f'Base CSS: {BASE_CSS}')
@@ -215,47 +450,498 @@ def setupglobals(verbose=False):
         print(json.dumps(d_SOCIALMEDIA, indent=4))
         print()
 
-def getenv(templatepath):
+def getenv(templatepath, cachedir=''):
     """
-    Get jinja2 env
+    Get jinja2 env.
+    The env is only created on the first call; after that, the same env
+    (and its cache of compiled templates) is returned.
+    If cachedir is set, compiled templates are also saved to disk,
+    keyed by a hash of the template source, so they can be reused by the next build
 
     :param templatepath: (str) path to the directory containing templates
+    :param cachedir: (str) path to the cache directory (omit for no on-disk cache)
     :returns: a jinja2 Environment object
     :rtype: jinja2.environment.Environment
     """
 
+    global d_env_global
+
+    if templatepath in d_env_global:
+        return d_env_global[templatepath]
+
+    import jinja2
+
+    bytecodecache = None
+    if cachedir:
+        os.makedirs(f'{cachedir}/jinja', exist_ok=True)
+        bytecodecache = jinja2.FileSystemBytecodeCache(f'{cachedir}/jinja')
+
     templateLoader = jinja2.FileSystemLoader(templatepath)
     env = jinja2.Environment(
         loader = templateLoader,
-        autoescape = jinja2.select_autoescape(['html', 'xml'])
+        autoescape = jinja2.select_autoescape(['html', 'xml']),
+        bytecode_cache = bytecodecache
     )
 
+    # Template helpers
+    env.globals['asset'] = getasset
+    env.globals['constant'] = getconstant
+    env.globals['card'] = getcard
+
+    d_env_global[templatepath] = env
+
     return env
 
-def removeemptylines(x):
+def getasset(mypath):
     """
-    Remove empty lines
+    The asset() template helper: get the path to link a static asset by.
+    If FINGERPRINT is on, this is the fingerprinted file (see fingerprint.py);
+    otherwise, it's the path itself
 
-    :param x: (str) a string, potentially with empty lines
-    :returns: a string with no empty lines
+    :param mypath: (str) the path of the asset in the output directory (e.g., static/img/wine.jpg)
+    :returns: (str) the path to link
     :rtype: str
     """
 
-    return '\n'.join([i for i in x.split('\n') if i.strip()])
+    d_assetmap = d_shared_global.get('d_assetmap', dict())
+
+    # Allow a leading slash
+    mykey = mypath.lstrip('/')
+    if mykey in d_assetmap:
+        return mypath[:len(mypath) - len(mykey)] + d_assetmap[mykey]
+
+    return mypath
+
+def getconstant(templatename):
+    """
+    The constant() template helper: render a site-constant fragment
+    (e.g., {{ constant("fragment.footer.html") }}) once per build, and reuse it on every page.
+    A template declares a fragment site-constant by calling constant() rather than
+    {% include %}, so the fragment may only use the common props (see getcommonprops()),
+    which are the same on every page
+
+    :param templatename: (str) the fragment (a template name)
+    :returns: (markupsafe.Markup) the rendered fragment, marked safe
+    :rtype: markupsafe.Markup
+    """
+
+    global d_constant_global
+
+    if templatename not in d_constant_global:
+        import markupsafe
+        env = getenv(d_shared_global['templatepath'])
+        template = env.get_template(templatename)
+        d_constant_global[templatename] = markupsafe.Markup(template.render(props = d_shared_global['d_common_props']))
 
-def checkpath(mydirectory, l_files, verbose=False):
+    return d_constant_global[templatename]
+
+def getcard(templatename, post, **kwargs):
+    """
+    The card() template helper: render a per-post fragment
+    (e.g., {{ card("fragment.card.visual.html", i, showdate = 1) }}) once per build, and reuse it
+    on every page listing the post (its section page, selected, feed, the homepage, etc.).
+    The fragment sees the post as post, the keyword arguments (the card's variant), and the common props.
+    Cards are also cached on disk, so an incremental build only renders the cards that changed
+
+    :param templatename: (str) the fragment (a template name)
+    :param post: (PageObject) the post
+    :param kwargs: the card's variant (e.g., showdate = 1). Values must be json-like
+    :returns: (markupsafe.Markup) the rendered card, marked safe
+    :rtype: markupsafe.Markup
     """
-    Check file existence
 
-    :param mydirectory: (str) Path to the directory
-    :param l_files: (list) a list of files
-    :param verbose: (bool) If True, print stuff
+    global d_card_global
+
+    import markupsafe
+
+    env = getenv(d_shared_global['templatepath'])
+
+    # Everything the card depends on
+    key = hashobj({
+        'template': gettemplatehash(env, templatename),
+        'post': post,
+        'variant': kwargs,
+        'props': d_shared_global['propshash'],
+        'assets': d_shared_global.get('assethash', '')
+    })
+
+    if key in d_card_global:
+        return d_card_global[key]
+
+    # One cache file per fragment, post, and variant
+    outputdir = d_shared_global['outputdir']
+    myhash = hashobj([post['urlpath'], kwargs])[:16]
+    cachefile = f'{outputdir}/{CACHEDIR}/cards/{templatename}/{myhash}.json'
+
+    mycard = None
+    try:
+        with open(cachefile, 'r') as f:
+            d_cache = json.load(f)
+        if d_cache['key'] == key:
+            mycard = d_cache['html']
+    except:
+        pass
+
+    if mycard is None:
+        template = env.get_template(templatename)
+        mycard = template.render(props = d_shared_global['d_common_props'], post = post, **kwargs)
+        # Written atomically: parallel workers may render the same card
+        os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+        writefileatomic(cachefile, json.dumps({'key': key, 'html': mycard}).encode('utf-8'))
+
+    d_card_global[key] = markupsafe.Markup(mycard)
+
+    return d_card_global[key]
+
+def bundleprops(d_props):
+    """
+    If BUNDLE is on, link the page's bundles (see bundle.py)
+    rather than its separate CSS and JS files
+
+    :param d_props: (dict) the page's props (modified in place)
+    """
+
+    d_bundles = d_shared_global.get('d_bundles')
+
+    if not d_bundles:
+        return
+
+    for kind in ['css', 'js']:
+        mybundle = d_bundles[kind].get(tuple(d_props[kind]))
+        if mybundle:
+            d_props[kind] = [mybundle]
+
+def getcriticalcss(env, templatename, l_cssfiles):
+    """
+    Get the critical CSS of a template (see criticalcss.py), to inline in <head>.
+    It's computed once per template and set of CSS files, and cached between builds;
+    the cache is keyed by the template chain and the CSS files' content
+
+    :param env: (jinja2.environment.Environment) the jinja2 env
+    :param templatename: (str) the template name
+    :param l_cssfiles: (list) the page's CSS files (paths in the output directory)
+    :returns: (str) the critical CSS
+    :rtype: str
+    """
+
+    global d_criticalcss_global
+
+    s_extra = getextrausage()
+    key = hashobj({
+        'template': gettemplatehash(env, templatename),
+        'css': [[i, d_shared_global['d_csshashes'].get(i, '')] for i in l_cssfiles],
+        'extra': sorted(s_extra)
+    })
+
+    if key not in d_criticalcss_global:
+        import criticalcss
+        outputdir = d_shared_global['outputdir']
+        d_criticalcss_global[key] = criticalcss.getcriticalcss(
+            env,
+            templatename,
+            l_cssfiles,
+            outputdir,
+            f'{outputdir}/{CACHEDIR}',
+            key,
+            s_extra
+        )
+
+    return d_criticalcss_global[key]
+
+def renderpage(template, d_props):
+    """
+    Render a page, minifying the HTML as Jinja generates it (see minify.py).
+    The page is never held in memory as a whole: it comes out in chunks
+
+    :param template: (jinja2.environment.Template) the template
+    :param d_props: (dict) the page's props
+    :returns: (generator) the minified page, in chunks, ending with a line break
+    :rtype: generator
+    """
+
+    yield from minify.minifyhtml(template.generate(props = d_props), keepbanner = KEEPBANNER)
+    yield '\n'
+
+def hashobj(x):
+    """
+    Hash a json-like object (e.g., a page object or a props dict)
+
+    :param x: a json-like object (dicts, lists, strs, numbers)
+    :returns: (str) the sha256 hex digest of the object
+    :rtype: str
+    """
+
+    # sort_keys so the hash doesn't depend on dict ordering;
+    # default=str for anything json doesn't know how to serialize
+    mystr = json.dumps(x, sort_keys=True, default=pageobject.jsondefault)
+
+    return hashlib.sha256(mystr.encode('utf-8')).hexdigest()
+
+def gettemplatechain(env, templatename):
+    """
+    Get the template chain of a template - i.e., the template itself plus
+    every template it extends, includes, or imports (recursively)
+
+    :param env: (jinja2.environment.Environment) the jinja2 env
+    :param templatename: (str) the template name
+    :returns: (list) the names of the templates in the chain
+    :rtype: list
+    """
+
+    global d_templatechain_global
+
+    if templatename in d_templatechain_global:
+        return d_templatechain_global[templatename]
+
+    import jinja2.meta
+
+    s_chain = {templatename}
+    l_todo = [templatename]
+
+    while l_todo:
+        source, _, _ = env.loader.get_source(env, l_todo.pop())
+        ast = env.parse(source)
+        l_refs = list(jinja2.meta.find_referenced_templates(ast))
+        # Fragments rendered by the constant() and card() helpers are in the chain too
+        for i in ast.find_all(jinja2.nodes.Call):
+            if isinstance(i.node, jinja2.nodes.Name) and i.node.name in ['constant', 'card'] and i.args:
+                l_refs.append(i.args[0].value if isinstance(i.args[0], jinja2.nodes.Const) else None)
+        # Note: references can be dynamic (e.g., {% include myvar %}), in which case
+        # jinja returns None. Then we can't know the chain, so include all templates
+        for i in l_refs:
+            for j in (env.list_templates() if i is None else [i]):
+                if j not in s_chain:
+                    s_chain.add(j)
+                    l_todo.append(j)
+
+    d_templatechain_global[templatename] = sorted(s_chain)
+
+    return d_templatechain_global[templatename]
+
+def gettemplatehash(env, templatename):
+    """
+    Get a hash of a template together with its template chain.
+    If one of these changes, every page using the template must be rebuilt
+
+    :param env: (jinja2.environment.Environment) the jinja2 env
+    :param templatename: (str) the template name
+    :returns: (str) the hash of the template chain
+    :rtype: str
+    """
+
+    global d_templatehash_global
+
+    if templatename in d_templatehash_global:
+        return d_templatehash_global[templatename]
+
+    l_hashes = []
+    for i in gettemplatechain(env, templatename):
+        source, _, _ = env.loader.get_source(env, i)
+        l_hashes.append([i, hashlib.sha256(source.encode('utf-8')).hexdigest()])
+
+    d_templatehash_global[templatename] = hashobj(l_hashes)
+
+    return d_templatehash_global[templatename]
+
+def loadmanifest(outputdir, verbose=False):
+    """
+    Load the build manifest from the previous build
+
+    :param outputdir: (str) path to the output directory
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) a dict whose keys are output files and whose values are
+        dicts with the keys "inputs" (the input hash) and "output" (the hash of the file)
+        (empty if there's no manifest or it's from a different version)
+    :rtype: dict
+    """
+
+    try:
+        with open(f'{outputdir}/{MANIFEST}', 'r') as f:
+            d_manifest = json.load(f)
+    except:
+        return dict()
+
+    # A different version of the code can produce different pages from the same inputs
+    if d_manifest.get('version') != VERSION:
+        return dict()
+
+    if verbose:
+        print(f"Loaded build manifest with {len(d_manifest['pages'])} pages")
+
+    return d_manifest['pages']
+
+def savemanifest(outputdir, d_manifest):
+    """
+    Save the build manifest for the next build
+
+    :param outputdir: (str) path to the output directory
+    :param d_manifest: (dict) a dict whose keys are output files and whose values are
+        dicts with the keys "inputs" (the input hash) and "output" (the hash of the file)
+    """
+
+    mystr = json.dumps({'version': VERSION, 'pages': d_manifest}, indent=1, sort_keys=True)
+    writefileatomic(f'{outputdir}/{MANIFEST}', mystr.encode('utf-8'))
+
+def isunchanged(outputdir, outputfile, inputhash, l_deps=[]):
+    """
+    Record the input hash (and the inputs) of an output file in the build manifest,
+    and check whether the file can be skipped - i.e., it was built
+    by the previous build from the same inputs and it still exists
+
+    :param outputdir: (str) path to the output directory
+    :param outputfile: (str) the output file, relative to the output directory
+    :param inputhash: (str) the hash of all the inputs of the output file
+    :param l_deps: (list) the names of the inputs of the output file (see depgraph.py)
+    :returns: (bool) True if the output file is up to date
+    :rtype: bool
+    """
+
+    global d_manifest_global
+
+    # If the file was already written during this build (e.g., latest/1 is
+    # created both as the 'latest' special page and by the Latest Feed),
+    # the last write must win, so don't skip it
+    alreadywritten = outputfile in d_manifest_global
+
+    if alreadywritten:
+        d_old = d_manifest_global[outputfile]
+    else:
+        d_old = d_manifest_prev_global.get(outputfile, dict())
+
+    # Keep the hash of the file as it is on disk (writepage() updates it)
+    d_manifest_global[outputfile] = {
+        'inputs': inputhash,
+        'output': d_old.get('output', ''),
+        'deps': sorted(set(l_deps))
+    }
+
+    if FORCE or alreadywritten:
+        return False
+
+    return d_old.get('inputs') == inputhash and os.path.isfile(f'{outputdir}/{outputfile}')
+
+def writefileatomic(mypath, mybytes):
+    """
+    Write a file atomically - i.e., write a temporary file
+    then rename it, so the file is never left half-written
+
+    :param mypath: (str) path to the file
+    :param mybytes: (bytes) the file content
+    """
+
+    mytmppath = f'{mypath}.{os.getpid()}.tmp'
+
+    with open(mytmppath, 'wb') as f:
+        f.write(mybytes)
+
+    os.replace(mytmppath, mypath)
+
+def writepage(outputdir, outputfile, chunks):
+    """
+    Write a page to the output directory, but only if its content changed.
+    The page is streamed, a chunk at a time, to a temporary file through a buffered writer
+    (hashing it on the way), so it's never held in memory as a whole.
+    If the hash matches the file on disk, the temporary file is dropped;
+    otherwise it replaces the file (atomically). Unchanged files keep their
+    modification times, so syncing (rsync, aws s3 sync) only uploads pages that actually changed
+
+    :param outputdir: (str) path to the output directory
+    :param outputfile: (str) the output file, relative to the output directory
+    :param chunks: (iterable) the page content, in chunks of str (e.g., from renderpage())
+    :returns: (bool) True if the file was written
+    :rtype: bool
+    """
+
+    global d_manifest_global
+
+    mypath = f'{outputdir}/{outputfile}'
+    mytmppath = f'{mypath}.{os.getpid()}.tmp'
+
+    h = hashlib.sha256()
+    mysize = 0
+    try:
+        with open(mytmppath, 'wb', buffering=WRITEBUFFER) as f:
+            for chunk in chunks:
+                mybytes = chunk.encode('utf-8')
+                h.update(mybytes)
+                f.write(mybytes)
+                mysize += len(mybytes)
+    except:
+        # E.g., an error in the template: don't leave the temporary file behind
+        if os.path.exists(mytmppath):
+            os.remove(mytmppath)
+        raise
+    myhash = h.hexdigest()
+
+    d_entry = d_manifest_global.setdefault(outputfile, dict())
+
+    # If the file on disk has the same size, compare hashes.
+    # Use the hash in the build manifest if there is one, otherwise hash the file
+    try:
+        oldsize = os.path.getsize(mypath)
+    except OSError:
+        oldsize = -1
+
+    if oldsize == mysize:
+        oldhash = d_entry.get('output')
+        if not oldhash:
+            h = hashlib.sha256()
+            with open(mypath, 'rb') as f:
+                for chunk in iter(lambda: f.read(WRITEBUFFER), b''):
+                    h.update(chunk)
+            oldhash = h.hexdigest()
+        if oldhash == myhash:
+            os.remove(mytmppath)
+            d_entry['output'] = myhash
+            return False
+
+    os.replace(mytmppath, mypath)
+    d_entry['output'] = myhash
+
+    return True
+
+def removestaleoutputs(outputdir, s_expected, verbose=False):
+    """
+    Remove the output files which the previous build wrote (i.e., which are in
+    its build manifest) but this build doesn't (e.g., the pages of a section
+    past its last page, after PAGESIZE went up), so they aren't deployed.
+    Directories left empty are removed too
+
+    :param outputdir: (str) path to the output directory
+    :param s_expected: (set) every output file of this build
+    :param verbose: (bool) if True, print stuff
+    """
+
+    for outputfile in sorted(set(d_manifest_prev_global) - s_expected):
+        mypath = f'{outputdir}/{outputfile}'
+        print(f'Removing stale page: {mypath}')
+        try:
+            os.remove(mypath)
+        except OSError:
+            continue
+
+        # Remove the directories left empty (e.g., feed/page/2/, then feed/page/)
+        mydirectory = os.path.dirname(outputfile)
+        while mydirectory:
+            try:
+                os.rmdir(f'{outputdir}/{mydirectory}')
+            except OSError:
+                break
+            if verbose:
+                print(f'Removing empty directory: {outputdir}/{mydirectory}')
+            mydirectory = os.path.dirname(mydirectory)
+
+def getoutputfile(urlpath):
+    """
+    Get the output file of a page, relative to the output directory
+
+    :param urlpath: (str) the urlpath of the page
+    :returns: (str) the path of the index.html file (e.g., post/wine/index.html)
+    :rtype: str
     """
 
-    for myfile in l_files:
-        if verbose:
-            print(f'Checking file existence: {mydirectory}/{myfile}')
-        assert os.path.isfile(f'{mydirectory}/{myfile}'), f'file not found: {mydirectory}/{myfile}'
+    # The homepage's urlpath is '', so strip the leading slash
+    return f'{urlpath}/index.html'.lstrip('/')
 
 def getnews(datadir):
     """
@@ -319,6 +1005,7 @@ def getcommonprops(
         d_css,
         shownews,
         homelink='',
+        socialsprite='',
         verbose=False
     ):
     """
@@ -342,6 +1029,8 @@ def getcommonprops(
     :param shownews: (bool) If True, show news
     :param homelink: (str) If set, use this as the "homepage" link
         when you click the page title (in the upper left corner)
+    :param socialsprite: (str) If set, the sprite of the social media icons,
+        which pages link to rather than inlining the icons
     :param verbose: (bool) If True, print stuff
     :returns: (dict) The props dict required by all templates
     :rtype: dict
@@ -370,76 +1059,36 @@ def getcommonprops(
         'news': news,
         'sidebar': l_sidebar,
         'homelink': homelink,
+        'socialsprite': socialsprite,
         'ishomepage': 0
     }
 
     if verbose:
         print('Common props:')
-        print(json.dumps(d_props, indent=4))
+        print(json.dumps(d_props, indent=4, default=pageobject.jsondefault))
 
     return d_props
 
-def errorcheckuniq(mycontentjson, attr='url', verbose=False):
-    """
-    Check for uniqueness of attribute
-
-    :param mycontentjson: (list of dicts) A json representing page objects
-    :param attr: (str) the attribute to check (default: url)
-    :param verbose: (bool) If True, print stuff
-    """
-
-    if verbose:
-        print(f'Checking for {attr} uniqueness ...')
-
-    # inspiration:
-    # https://stackoverflow.com/questions/9835762/how-do-i-find-the-duplicates-in-a-list-and-create-another-list-with-them
-    seen = []
-    duplicates = []
-
-    for i in mycontentjson:
-        if i[attr] in seen:
-            duplicates.append(i[attr])
-        else:
-            seen.append(i[attr])
-
-    if len(duplicates) > 0:
-        color.warnprint(f'ERROR: {attr} attribute must be unique but found overlap: {duplicates}')
-    assert len(duplicates) == 0, f'{attr} attribute must be unique'
-
-def errorcheckuniqcategory(mysectionsjson):
-    """
-    Check that sidebar json has unique categories.
-    If error, stop the whole show
-
-    :param mysectionsjson: (list of dicts) A json representing posts
-    """
-
-    mycategories = [i['category'] for i in mysectionsjson]
-    assert len(mycategories) == len(set(mycategories)), 'Section category attributes must be unique'
-
-def errorcheckpostfields(mycontentjson, strict=True):
+def layerprops(d_props, d_layer=None):
     """
-    Ensure a post object has required fields
-
-    :param mycontentjson: (list of dicts) A json representing post objects
-    :param strict: (bool) if True, throw errors
+    Stack page-specific props on top of the props shared by every page,
+    without copying them. Lookups check the page-specific layer first;
+    new keys are only ever written to it, so the shared props are never modified.
+    Templates see the result the same way as a dict (e.g., props.css)
+
+    :param d_props: (dict) the common props dict (or an already layered props)
+    :param d_layer: (dict) the page-specific props (omit to start with none)
+    :returns: the layered props
+    :rtype: collections.ChainMap
     """
 
-    if strict:
-        for i in mycontentjson:
-            assert set(REQUIRED_POST_FIELDS).issubset(set(i.keys())), f'Missing keys for post: {i}'
-
-def errorchecksectionfields(mycontentjson, strict=True):
-    """
-    Ensure a section object has required fields
+    d_layer = dict() if d_layer is None else d_layer
 
-    :param mycontentjson: (list of dicts) A json representing section objects
-    :param strict: (bool) if True, throw errors
-    """
+    if isinstance(d_props, collections.ChainMap):
+        return d_props.new_child(d_layer)
 
-    if strict:
-        for i in mycontentjson:
-            assert set(REQUIRED_SECTION_FIELDS).issubset(set(i.keys())), f'Missing keys for post: {i}'
+    # A read-only view, to catch accidental writes to the shared props
+    return collections.ChainMap(d_layer, types.MappingProxyType(d_props))
 
 def filterandtweakjson(mycontentjson, homeurl, verbose=False):
     """
@@ -451,7 +1100,7 @@ def filterandtweakjson(mycontentjson, homeurl, verbose=False):
     :param mycontentjson: (list of dicts) A json representing visual (img, video) posts
     :param homeurl: (str) homepage url
     :param verbose: (bool) If True, print stuff
-    :returns: (list of dicts) A revised json
+    :returns: (list of PageObjects) A revised json
     :rtype: list
     """
 
@@ -460,8 +1109,8 @@ def filterandtweakjson(mycontentjson, homeurl, verbose=False):
     for i in mycontentjson:
         # Throw away unpublished elts
         if i['publish']:
-            # Deep copy so we don't modify the iterating variable
-            j = i.copy()
+            # Create a page object (so we don't modify the iterating variable)
+            j = pageobject.PageObject(i)
             # Convert various attribute from str to list
             for attrib in ['category', 'files', 'keywords']:
                 # This construction does double duty by checking both presence and that value is not empty
@@ -485,11 +1134,18 @@ def filterandtweakjson(mycontentjson, homeurl, verbose=False):
                 j['ishomepage'] = True
                 j['urlpath'] = ''
 
+            # Parse the date once (e.g., for sorting the feed).
+            # A date which doesn't parse leaves the post out of the feed (see validate.parsedate())
+            if j.get('date'):
+                mydate = validate.parsedate(j['date'])
+                if mydate is not None:
+                    j['dateparsed'] = mydate
+
             l.append(j)
 
     if verbose:
         print('filtered json:')
-        print(json.dumps(l, indent=4))
+        print(json.dumps(l, indent=4, default=pageobject.jsondefault))
 
     return l
 
@@ -525,25 +1181,157 @@ def geturlpath(d_page, prefix='', override=''):
     elif d_page['type'] in ['img', 'video', 'article']:
         return f"post/{d_page['url']}"
 
-def createcategorydict(mycontentjson, verbose=False):
+def getsectionposts(
+        d_page,
+        d_vis_category2posts,
+        d_article_category2posts,
+        l_feed_vis,
+        l_selected_vis
+    ):
     """
-    Restructure content json from a json-like list of dicts
-    to a dict whose keys are categories. So it starts looking like this:
-
-        [
-            {
-                "name": "Post1",
-                "category": "travel"
-            },
-            {
-                "name": "Post2",
-                "category": "travel,food"
-            }
-        ]
-
-    But ends looking like this:
+    Get the posts listed on a section type page
+    (including the special pages 'selected' and 'feed')
 
-        {
+    :param d_page (dict): a dict representing a page
+    :param d_vis_category2posts (dict): dict with categories as keys and jsons as values (for visual posts)
+    :param d_article_category2posts (dict): ditto for article posts
+    :param l_feed_vis (list): visual post feed
+    :param l_selected_vis (list): selected visual posts
+    :returns: (tuple) the list of posts (empty if not a section type page)
+        and the names of the inputs it comes from (see depgraph.py)
+    :rtype: tuple
+    """
+
+    if d_page['url'] == 'selected':
+        # 'selected' is a special page
+        # (assumed to be a section type page (todo: check?))
+        return l_selected_vis, ['list:selected_vis']
+    elif d_page['url'] == 'feed':
+        # 'feed' is a special page
+        # (assumed to be a section type page (todo: check?))
+        return l_feed_vis, ['list:feed_vis']
+    elif d_page['type'] == 'sectionvisual' and len(d_page['category']) > 0:
+        # todo: error checking should have already happened at this point (fix)
+        return (
+            d_vis_category2posts.get(d_page['category'][0], []),
+            [f"list:category_vis:{d_page['category'][0]}"]
+        )
+    elif d_page['type'] == 'sectionarticle' and len(d_page['category']) > 0:
+        return (
+            d_article_category2posts.get(d_page['category'][0], []),
+            [f"list:category_article:{d_page['category'][0]}"]
+        )
+
+    return [], []
+
+def getpagesize(url):
+    """
+    Get the number of posts per page for a section type page
+
+    :param url: (str) the url key of the page
+    :returns: (int) the number of posts per page (0 means all the posts on one page)
+    :rtype: int
+    """
+
+    return d_URL2PAGESIZE.get(url, PAGESIZE)
+
+def getnumpages(numposts, pagesize):
+    """
+    :param numposts: (int) the number of posts of a section type page
+    :param pagesize: (int) the number of posts per page (0 means all the posts on one page)
+    :returns: (int) the number of pages
+    :rtype: int
+    """
+
+    if pagesize <= 0 or numposts <= pagesize:
+        return 1
+
+    # Round up
+    return -(-numposts // pagesize)
+
+def getpageurlpath(d_page, pagenum):
+    """
+    Get the url path of a page of a paginated section page:
+    the first page is at the page's own url path, the others at
+    <url path>/page/2, <url path>/page/3, etc.
+
+    :param d_page (dict): a dict representing a (section type) page
+    :param pagenum: (int) the page number (starting at 1)
+    :returns: (str) the url path
+    :rtype: str
+    """
+
+    if pagenum == 1:
+        return d_page.get('urlpathfirst', d_page['urlpath'])
+
+    # The homepage's urlpath is empty, so use its non-empty url path
+    return f"{d_page['urlpathnonempty']}/page/{pagenum}"
+
+def createpaginatedpages(d_page, numposts, pagesize):
+    """
+    Create the page objects for pages 2, 3, etc. of a paginated section page
+
+    :param d_page (dict): a dict representing a (section type) page
+    :param numposts: (int) the number of posts of the page
+    :param pagesize: (int) the number of posts per page (0 means all the posts on one page)
+    :returns: (list of dicts) the page objects (empty if everything fits on one page)
+    :rtype: list
+    """
+
+    l = []
+
+    for pagenum in range(2, getnumpages(numposts, pagesize) + 1):
+        l.append(d_page.override({
+            'urlpath': getpageurlpath(d_page, pagenum),
+            'ishomepage': False,
+            'pagenum': pagenum,
+            # Keep the url path of the first page, for the prev links
+            'urlpathfirst': d_page['urlpath']
+        }))
+
+    return l
+
+def getpagination(d_page, pagenum, numpages):
+    """
+    Get the pagination dict of a page of a paginated section page
+
+    :param d_page (dict): a dict representing a (section type) page
+    :param pagenum: (int) the page number (starting at 1)
+    :param numpages: (int) the number of pages
+    :returns: (dict) a dict with the keys "page", "numpages", "first", "prev", "next", "last"
+        whose values are the page number, the number of pages, and url paths
+        (prev and next are None on the first and last pages)
+    :rtype: dict
+    """
+
+    return {
+        'page': pagenum,
+        'numpages': numpages,
+        'first': getpageurlpath(d_page, 1),
+        'prev': getpageurlpath(d_page, pagenum - 1) if pagenum > 1 else None,
+        'next': getpageurlpath(d_page, pagenum + 1) if pagenum < numpages else None,
+        'last': getpageurlpath(d_page, numpages)
+    }
+
+def createcategorydict(mycontentjson, verbose=False):
+    """
+    Restructure content json from a json-like list of dicts
+    to a dict whose keys are categories. So it starts looking like this:
+
+        [
+            {
+                "name": "Post1",
+                "category": "travel"
+            },
+            {
+                "name": "Post2",
+                "category": "travel,food"
+            }
+        ]
+
+    But ends looking like this:
+
+        {
             "travel": [
                 {
                     "name": "Post1",
@@ -589,7 +1377,7 @@ def createcategorydict(mycontentjson, verbose=False):
 
     if verbose:
         print('content dict:')
-        print(json.dumps(res, indent=4))
+        print(json.dumps(res, indent=4, default=pageobject.jsondefault))
 
     return res
 
@@ -608,14 +1396,14 @@ def createfeed(l_posts, numposts, verbose=False):
     if not l_posts:
         return []
 
-    # Filter out special pages and pages with no date
-    l_filter = [i for i in l_posts if i['date'] and not i['specialpage']]
+    # Filter out special pages and pages with no (well-formed) date
+    l_filter = [i for i in l_posts if i['date'] and i.get('dateparsed') and not i['specialpage']]
 
     # Find newest posts by sorting by date
     # Throw out objs with no date
     sortedbydate = sorted(
         l_filter,
-        key=lambda d: datetime.datetime.strptime(d['date'], "%Y-%m-%d"),
+        key=lambda d: d['dateparsed'],
         # key=lambda d: int(''.join(d['date'].split('-'))),
         reverse=True
     )
@@ -775,16 +1563,33 @@ def create404(
     """
 
     # Get Jinja2 env
-    env = getenv(templatepath)
+    env = getenv(templatepath, f'{outputdir}/{CACHEDIR}')
 
     # Create error page
-    d_props_error_page = d_props.copy()
     template = env.get_template(d_TYPE2TEMPLATE['error'])
     # Overwrite these keys
-    d_props_error_page['title'] = f"{d_props['title']} | 404: Page Not Found"
-    d_props_error_page['keywords'] = 'error'
-    mypage = removeemptylines(template.render(props = d_props_error_page))
-    print(mypage, file=open(f"{outputdir}/error.html", 'w'))
+    d_props_error_page = layerprops(d_props, {
+        'title': f"{d_props['title']} | 404: Page Not Found",
+        'keywords': 'error'
+    })
+    if CRITICALCSS:
+        d_props_error_page['criticalcss'] = getcriticalcss(env, template.name, d_props_error_page['css'])
+    bundleprops(d_props_error_page)
+
+    # Skip the page if its inputs haven't changed since the last build
+    inputhash = hashobj({
+        'props': d_props_error_page,
+        'template': gettemplatehash(env, template.name),
+        'assets': d_shared_global.get('assethash', ''),
+        'render': {i: globals()[i] for i in RENDER_CONFIG_KEYS}
+    })
+    l_deps = ['props', 'assets'] + [f'template:{i}' for i in gettemplatechain(env, template.name)]
+    l_deps.extend([f'config:{i}' for i in RENDER_CONFIG_KEYS])
+    if isunchanged(outputdir, 'error.html', inputhash, l_deps):
+        print('Unchanged error page: error.html')
+        return
+
+    writepage(outputdir, 'error.html', renderpage(template, d_props_error_page))
 
 def mkpagedir(
         mydirectory,
@@ -856,6 +1661,7 @@ def createpage(
         addcss=[],
         xtemplate='',
         marker='post',
+        l_deps=[],
         verbose=False,
         strict=True
     ):
@@ -877,26 +1683,31 @@ def createpage(
     :param xtemplate: (str) the (external) template
         If provided, this overrides the template determined by page type
     :param marker: (str) the kind of page being created (default: post)
+    :param l_deps: (list) names of inputs of the page (see depgraph.py), in addition to
+        the ones createpage() knows about (the page object, posts, templates, etc.)
     :param verbose: (bool) if True, print stuff
     :param strict: (bool) if True, throw errors
     """
 
     # Get Jinja env
-    env = getenv(templatepath)
+    env = getenv(templatepath, f'{outputdir}/{CACHEDIR}')
 
-    # Copy the common props shared by every post (so as not to modify the argument)
-    d_props_page = d_props.copy()
+    # Layer the page's props on top of the common props shared by every post
+    # (so as not to modify the argument)
+    d_props_page = layerprops(d_props)
 
     # Add CSS
-    d_props_page['css'] = d_props_page['css'] + addcss
     # Note: this: d_props_page['css'].extend(addcss) leads
-    # to a bug where it's modifying the reference, not the copy
+    # to a bug where it's modifying the reference in the common props
+    if addcss:
+        d_props_page['css'] = d_props_page['css'] + addcss
 
     # Add JS
-    d_props_page['js'] = d_props_page['js'] + addjs
+    if addjs:
+        d_props_page['js'] = d_props_page['js'] + addjs
 
-    # Copy the page object so as not to modify the argument
-    mypage = d_page.copy()
+    # Note: the page object isn't modified, so there's no need to copy it
+    mypage = d_page
 
     mydirectory = f"{outputdir}/{mypage['urlpath']}"
 
@@ -904,14 +1715,6 @@ def createpage(
         marker = 'homepage'
         d_props_page['ishomepage'] = 1
 
-    mkpagedir(
-        mydirectory,
-        mypage['name'],
-        mypage['type'],
-        marker,
-        mypage['urlpath']
-    )
-
     # Set template
     template = None
     try:
@@ -927,8 +1730,22 @@ def createpage(
         color.warnprint(f"ERROR: template not fouund: {mypage['url']}")
         assert False, 'No template'
 
+    # If the page duplicates another page (e.g., it's a page of the Latest Feed),
+    # link the original as canonical, or write a small alias page instead (see DUPLICATES)
+    isalias = False
+    canonical = mypage.get('canonical')
+    if canonical is not None and canonical != mypage['urlpath']:
+        if DUPLICATES != 'copy':
+            d_props_page['canonical'] = canonical
+        if DUPLICATES == 'alias':
+            isalias = True
+            marker = 'alias'
+            template = env.get_template(d_TYPE2TEMPLATE.get('alias', ALIAS_TEMPLATE))
+        l_deps = l_deps + ['config:DUPLICATES']
+
     # If article, read HTML contents
-    if mypage['type'] == 'article':
+    # (an alias page doesn't show them)
+    if mypage['type'] == 'article' and not isalias:
         # Note: use mypage['url'] bc it's possible mypage['urlpath'] == ''
         # which won't work for readarticlecontent()
         d_props_page['articlebody'] = readarticlecontent(
@@ -947,7 +1764,7 @@ def createpage(
     if mypage['url'] == DEBUG:
         print('*** debug ***')
         print(f"props for url: {mypage['url']}")
-        print(json.dumps(d_props_page, indent=4))
+        print(json.dumps(d_props_page, indent=4, default=pageobject.jsondefault))
         print()
 
     # Using global vars does not follow best practices,
@@ -966,8 +1783,51 @@ def createpage(
         'js': ','.join(d_props_page['js'])
     })
 
-    finalpage = removeemptylines(template.render(props = d_props_page))
-    print(finalpage, file=open(f"{mydirectory}/index.html", 'w'))
+    # Inline the template's critical CSS, and load the stylesheets asynchronously
+    if CRITICALCSS and not isalias:
+        d_props_page['criticalcss'] = getcriticalcss(env, template.name, d_props_page['css'])
+
+    # Link the bundles, if any (the log keeps the separate files)
+    bundleprops(d_props_page)
+
+    # Skip the page if its inputs haven't changed since the last build
+    # Note: the props contain the page object, the posts, and the article body (content.html)
+    outputfile = getoutputfile(mypage['urlpath'])
+    inputhash = hashobj({
+        'props': d_props_page,
+        'template': gettemplatehash(env, template.name),
+        'assets': d_shared_global.get('assethash', ''),
+        'render': {i: globals()[i] for i in RENDER_CONFIG_KEYS}
+    })
+    # Record what the page depends on, for the dependency graph
+    l_deps = l_deps + [
+        'props',
+        'assets',
+        f"page:{mypage['url']}",
+        'config:d_TYPE2TEMPLATE',
+        'config:d_TYPE2CSS',
+        'config:d_TYPE2JS',
+        'config:d_URL2CSS',
+        'config:d_URL2JS'
+    ] + [f'config:{i}' for i in RENDER_CONFIG_KEYS]
+    l_deps.extend([f"page:{i['url']}" for i in d_props_page.get('posts', [])])
+    l_deps.extend([f'template:{i}' for i in gettemplatechain(env, template.name)])
+    if mypage['type'] == 'article':
+        l_deps.append(f"file:published/article/{mypage['url']}/html/content.html")
+
+    if isunchanged(outputdir, outputfile, inputhash, l_deps):
+        print(f"Unchanged {mypage['type']} page [{marker}]: {mypage['name']} at url = /{mypage['urlpath']}")
+        return
+
+    mkpagedir(
+        mydirectory,
+        mypage['name'],
+        mypage['type'],
+        marker,
+        mypage['urlpath']
+    )
+
+    writepage(outputdir, outputfile, renderpage(template, d_props_page))
 
 def getmarker(ishomepage, specialpage, other):
     """
@@ -1030,34 +1890,36 @@ def createpagewrapper(
     :param strict: (bool) if True, throw errors
     """
 
-    # Copy dicts, so as not to modify the function arguments
-    d_props = d_common_props.copy()
-    d_page = d_page_input.copy()
+    # Layer the page's props on top of the common props, so as not to modify the function argument
+    # (the page object isn't modified, so there's no need to copy it)
+    d_props = layerprops(d_common_props)
+    d_page = d_page_input
 
     ## Get posts for section type pages
 
-    l_posts = []
+    # l_deps: names of the inputs of the page, for the dependency graph (see depgraph.py)
+    l_posts, l_deps = getsectionposts(
+        d_page,
+        d_vis_category2posts,
+        d_article_category2posts,
+        l_feed_vis,
+        l_selected_vis
+    )
 
-    # Set l_posts
-    if d_page['url'] == 'selected':
-        # 'selected' is a special page
-        # (assumed to be a section type page (todo: check?))
-        l_posts = l_selected_vis
-    elif d_page['url'] == 'feed':
-        # 'feed' is a special page
-        # (assumed to be a section type page (todo: check?))
-        l_posts = l_feed_vis
-    elif d_page['type'] == 'sectionvisual':
-        # todo: error checking should have already happened at this point (fix)
-        if len(d_page['category']) > 0:
-            l_posts = d_vis_category2posts.get(d_page['category'][0], [])
-        else:
-            color.warnprint(f"WARNING: no category for section page: {i['url']}")
-    elif d_page['type'] == 'sectionarticle':
-        if len(d_page['category']) > 0:
-            l_posts = d_article_category2posts.get(d_page['category'][0], [])
-        else:
-            color.warnprint(f"WARNING: no category for section page: {i['url']}")
+    if d_page['type'] in ['sectionvisual', 'sectionarticle'] and len(d_page['category']) == 0:
+        if d_page['url'] not in ['selected', 'feed']:
+            color.warnprint(f"WARNING: no category for section page: {d_page['url']}")
+
+    ## Paginate section type pages
+
+    if l_deps:
+        pagesize = getpagesize(d_page['url'])
+        numpages = getnumpages(len(l_posts), pagesize)
+        if numpages > 1:
+            pagenum = d_page.get('pagenum', 1)
+            l_posts = l_posts[(pagenum - 1) * pagesize:pagenum * pagesize]
+            d_props['pagination'] = getpagination(d_page, pagenum, numpages)
+        l_deps.extend(['config:PAGESIZE', 'config:d_URL2PAGESIZE'])
 
     d_props['posts'] = l_posts
 
@@ -1073,26 +1935,30 @@ def createpagewrapper(
         pass
     elif d_page['type'] == 'article':
         d_nav = d_nav_article
+        l_deps.append(f"nav:article:{d_page['url']}")
     elif d_page['type'] == 'img' or d_page['type'] == 'video':
         d_nav = d_nav_vis
+        l_deps.append(f"nav:vis:{d_page['url']}")
 
     ## Latest is a special case
 
     if d_page['url'] == 'latest':
 
         # Modify d_page
-        # Instead of using the d_page dict, use a copy of the latest visual post
-        d_page = l_feed_vis[0].copy()
-        # Turn this on
-        d_page['showdate'] = 1
-        # This is tricky:
-        # We've switched the page to the most recent visual post
-        # However, we need to preserve attributes from d_page_input
-        # For example, if HOMEPAGE == 'latest', we need to make sure
-        # this is honored regardless of the 'ishomepage' attribute of the most recent post
-        d_page['ishomepage'] = d_page_input['ishomepage']
-        # Ditto: the urlpath attr needs to be updated to that of d_page_input (latest/1)
-        d_page['urlpath'] = d_page_input['urlpath']
+        # Instead of using the d_page dict, use the latest visual post
+        # (with a few fields changed, via a view, so it isn't copied)
+        d_page = l_feed_vis[0].override({
+            # Turn this on
+            'showdate': 1,
+            # This is tricky:
+            # We've switched the page to the most recent visual post
+            # However, we need to preserve attributes from d_page_input
+            # For example, if HOMEPAGE == 'latest', we need to make sure
+            # this is honored regardless of the 'ishomepage' attribute of the most recent post
+            'ishomepage': d_page_input['ishomepage'],
+            # Ditto: the urlpath attr needs to be updated to that of d_page_input (latest/1)
+            'urlpath': d_page_input['urlpath']
+        })
         # This is a hack
         # In the case the lastest post is the homepage
         # and the Latest Feed is active with at least 2 posts
@@ -1103,12 +1969,20 @@ def createpagewrapper(
         if d_page['ishomepage'] and LATESTFEED and NUMPOSTSFEED > 1:
             d_page['hackurl'] = 'latest/2'
 
+        # Unless it's the homepage, the page duplicates the latest post's own page (see DUPLICATES)
+        if not d_page['ishomepage']:
+            d_page['canonical'] = l_feed_vis[0]['urlpath']
+
+        # The page is the latest post (whose own page object createpage() adds)
+        # but the 'latest' page object, the feed, and the hack matter too
+        l_deps.extend(['page:latest', 'list:feed_vis', 'config:LATESTFEED', 'config:NUMPOSTSFEED'])
+
     ## Finally, create page
 
     if d_page['url'] == DEBUG:
         print('*** debug ***')
         print(f"input to createpage() for url: {d_page['url']}")
-        print(json.dumps(d_page, indent=4))
+        print(json.dumps(d_page, indent=4, default=pageobject.jsondefault))
         print()
 
     createpage(
@@ -1122,77 +1996,416 @@ def createpagewrapper(
         addcss = d_TYPE2CSS.get(d_page['type'], []) + d_URL2CSS.get(d_page['url'], []),
         xtemplate = d_page.get('template', ''),
         marker = getmarker(d_page['ishomepage'], d_page['specialpage'], d_page['type']),
+        l_deps = l_deps,
         verbose = verbose,
         strict = strict
     )
 
-#-------------------------------------------------------------------------------
-#   Main
-#-------------------------------------------------------------------------------
+def buildpage(kind, d_page):
+    """
+    Build a single page, using the shared data structures in d_shared_global
 
-if __name__ == "__main__":
+    :param kind: (str) 'post' for an ordinary page object (built via createpagewrapper())
+        or 'latest' for a page of the Latest Feed (built via createpage())
+    :param d_page (dict): a dict representing a page
+    """
 
-    ### Generate pages with Jinja
+    d = d_shared_global
 
-    args = getarg()
+    if d_page['url'] == DEBUG:
+        print('*** debug ***')
+        print(f"Page object: {d_page['url']}")
+        print(d_page)
+        print()
 
-    # Path to templates directory
-    templatepath = args.templates
-    # Path to data directory
-    datadir = args.data
-    # Path to output directory
-    outputdir = args.outputdir
-    # strict
-    strict = not args.nostrict
+    if kind == 'latest':
+        createpage(
+            d_page,
+            d['d_common_props'],
+            d['d_nav_latest'],
+            d['templatepath'],
+            d['datadir'],
+            d['outputdir'],
+            addjs = d_TYPE2JS.get(d_page['type'], []) + d_URL2JS.get(d_page['url'], []),
+            addcss = d_TYPE2CSS.get(d_page['type'], []) + d_URL2CSS.get(d_page['url'], []),
+            xtemplate = d_page.get('template', ''),
+            marker = 'specialpage',
+            l_deps = ['list:feed_vis', f"nav:latest:{d_page['url']}"],
+            verbose = d['verbose'],
+            strict = d['strict']
+        )
+    else:
+        createpagewrapper(
+            d_page,
+            d['d_common_props'],
+            d['d_vis_category2posts'],
+            d['d_article_category2posts'],
+            d['d_nav_vis'],
+            d['d_nav_article'],
+            d['l_feed_vis'],
+            d['l_feed_article'],
+            d['l_selected_vis'],
+            d['l_selected_article'],
+            d['templatepath'],
+            d['datadir'],
+            d['outputdir'],
+            verbose = d['verbose'],
+            strict = d['strict']
+        )
+
+def initworker(d_shared, d_manifest_prev, force):
+    """
+    Initialize a worker process of a parallel build.
+    This runs once per worker, so the shared data structures
+    are sent to each worker once rather than once per page
+
+    :param d_shared: (dict) the read-only data structures shared by every page
+    :param d_manifest_prev: (dict) the build manifest from the previous build
+    :param force: (bool) if True, ignore the build manifest
+    """
+
+    global d_shared_global
+    global d_manifest_prev_global
+    global FORCE
+
+    d_shared_global = d_shared
+    d_manifest_prev_global = d_manifest_prev
+    FORCE = force
+
+    # Flush whole lines, so the console output of different workers doesn't get jumbled
+    sys.stdout.reconfigure(line_buffering=True, write_through=False)
 
     # Import constants, found in datadir/dataconfig.py
-    sys.path.append(datadir)
-    setupglobals(verbose=True)
+    # (Necessary if the worker process was spawned rather than forked)
+    if d_shared['datadir'] not in sys.path:
+        sys.path.append(d_shared['datadir'])
+    setupglobals()
 
-    ## Read data
+def workerbuildpage(task):
+    """
+    Build a single page in a worker process.
+    Rather than appending to the worker's own globals, which the main process can't see,
+    the log information and build manifest entries are returned to the main process
+
+    :param task: (tuple) (kind, d_page, d_written) where kind and d_page are
+        as in buildpage(), and d_written holds the build manifest entries
+        of output files already written during this build
+    :returns: (tuple) a list of log dicts and a dict of build manifest entries
+    :rtype: tuple
+    """
 
-    sectionsjson = []
-    contentvisjson = []
-    contentarticlejson = []
+    global l_log_global
+    global d_manifest_global
 
-    # Get sections
-    with open(f'{datadir}/content.sections.json', 'r') as f:
-        contentsectionjson = json.load(f)
+    kind, d_page, d_written = task
 
-    # Get visual posts (imgs and video)
-    with open(f'{datadir}/content.visual.json', 'r') as f:
-        contentvisjson = json.load(f)
+    l_log_global = []
+    # Let isunchanged() and writepage() know which files have already been written
+    d_manifest_global = d_written
 
-    # Get article posts
-    with open(f'{datadir}/content.article.json', 'r') as f:
-        contentarticlejson = json.load(f)
+    buildpage(kind, d_page)
 
-    ## Check for errors
+    return l_log_global, d_manifest_global
+
+def buildpages(l_tasks, pool=None, jobs=1):
+    """
+    Build a list of pages, either one at a time or, if a pool is given,
+    in parallel. Either way, the log and the build manifest end up
+    in the same order as a serial build
 
-    for j in [i['url'] for i in contentsectionjson + contentvisjson + contentarticlejson]:
-        assert j not in RESERVED, f'Clash with reserved url for page object: {j}'
+    :param l_tasks: (list of tuples) a list of (kind, d_page) tuples (see buildpage())
+    :param pool: (multiprocessing.pool.Pool) a pool of worker processes (or None)
+    :param jobs: (int) the number of worker processes in the pool
+    """
 
-    # Check for category uniqueness
-    errorcheckuniqcategory(contentsectionjson)
+    if pool is None:
+        for kind, d_page in l_tasks:
+            buildpage(kind, d_page)
+        return
 
-    # Check for url uniqueness
-    errorcheckuniq(
-        l_SPECIAL_PAGES + contentsectionjson + contentvisjson + contentarticlejson,
-        attr = 'url',
-        verbose = args.verbose
-    )
+    l_tasks_written = []
+    for kind, d_page in l_tasks:
+        outputfile = getoutputfile(d_page['urlpath'])
+        d_written = dict()
+        if outputfile in d_manifest_global:
+            d_written[outputfile] = d_manifest_global[outputfile]
+        l_tasks_written.append((kind, d_page, d_written))
 
-    # Misc errors
-    for i in d_SOCIALMEDIA.keys():
-        assert i in ALLOWED_SOCIAL, f'Found unrecognized social media type: {i}'
+    # Send pages to workers in small batches
+    chunksize = max(1, len(l_tasks) // (4 * jobs))
 
-    ## Create various data structures
+    for l_log, d_manifest in pool.imap(workerbuildpage, l_tasks_written, chunksize):
+        l_log_global.extend(l_log)
+        d_manifest_global.update(d_manifest)
+
+def getcssjsfiles():
+    """
+    :returns: (list) every CSS and JS file the site uses (paths in the output directory)
+    :rtype: list
+    """
+
+    cssfiles = [i for i in list(d_TYPE2CSS.values()) + list(d_URL2CSS.values())]
+    cssfiles.append(BASE_CSS)
+    cssfiles = sum(cssfiles, [])
+    jsfiles = [i for i in list(d_TYPE2JS.values()) + list(d_URL2JS.values())]
+    jsfiles.append(BASE_JS)
+    jsfiles = sum(jsfiles, [])
+
+    return cssfiles + jsfiles
+
+def writesocialsprite(templatepath, outputdir, assets):
+    """
+    Write the sprite of the social media icons (see fragment.socialsprite.svg),
+    with only the icons in d_SOCIALMEDIA. Pages link its icons with <use href>,
+    so the icons are downloaded once rather than inlined in every page.
+    The sprite is only rewritten if it changed
+
+    :param templatepath: (str) path to the directory containing templates
+    :param outputdir: (str) path to the output directory
+    :param assets: (AssetIndex) the asset index (updated if the sprite is written)
+    """
+
+    env = getenv(templatepath, f'{outputdir}/{CACHEDIR}')
+    template = env.get_template('fragment.socialsprite.svg')
+    mysprite = ''.join(minify.minifyhtml(template.generate(props = {'social': d_SOCIALMEDIA})))
+    mybytes = (mysprite.strip() + '\n').encode('utf-8')
+
+    mypath = f'{outputdir}/{SOCIALSPRITE_FILE}'
+    try:
+        with open(mypath, 'rb') as f:
+            if f.read() == mybytes:
+                return
+    except OSError:
+        pass
+
+    os.makedirs(os.path.dirname(mypath), exist_ok=True)
+    writefileatomic(mypath, mybytes)
+    assets.setentry(outputdir, SOCIALSPRITE_FILE)
 
-    # Create a big dict of everything, with urls as keys
-    d_all = {
-        i['url']:i for i in l_SPECIAL_PAGES + contentsectionjson + contentvisjson + contentarticlejson
+    print(f'Wrote the social media icon sprite: {mypath} ({len(mybytes)} bytes)')
+
+def getextrausage():
+    """
+    :returns: (set) the classes (.name) and ids (#name) used by the site although
+        they may not be written in the templates: the d_CSS extras and l_CSS_ALLOWLIST
+        (e.g., classes added by JS)
+    :rtype: set
+    """
+
+    s_used = set()
+
+    # The d_CSS extras are classes
+    for i in ['body_extra', 'main_extra', 'nav_extra']:
+        s_used.update(['.' + j for j in d_CSS.get(i, '').split()])
+
+    # Allowlisted names can be given with or without a leading . or #: bare names are classes
+    s_used.update([i if i[:1] in '.#' else '.' + i for i in l_CSS_ALLOWLIST])
+
+    return s_used
+
+def loadcssusage(outputdir):
+    """
+    :param outputdir: (str) path to the output directory
+    :returns: (set) the elements, classes (.name), and ids (#name) used by the site,
+        as found by the last build, or None if there's no record
+    :rtype: set
+    """
+
+    try:
+        with open(f'{outputdir}/{CACHEDIR}/{CSSUSAGE}', 'r') as f:
+            return set(json.load(f)['used'])
+    except:
+        return None
+
+def updatecssusage(outputdir, verbose=False):
+    """
+    Find the elements, classes, and ids used by the site (see prunecss.py):
+    those in the pages of the build manifest, plus the d_CSS extras and l_CSS_ALLOWLIST
+    (e.g., classes added by JS). A page is only parsed again if its content changed
+
+    :param outputdir: (str) path to the output directory
+    :param verbose: (bool) if True, print stuff
+    :returns: (bool) True if the usage changed since the last build (so the CSS must be pruned again)
+    :rtype: bool
+    """
+
+    import prunecss
+
+    usagefile = f'{outputdir}/{CACHEDIR}/{CSSUSAGE}'
+    try:
+        with open(usagefile, 'r') as f:
+            d_cache = json.load(f)
+    except:
+        d_cache = {'pages': dict(), 'used': None}
+
+    # A dict whose keys are pages and whose values are [hash of the page, list of used names]
+    d_pages = dict()
+    numparsed = 0
+    for outputfile, d_entry in sorted(d_manifest_global.items()):
+        old = d_cache['pages'].get(outputfile)
+        if old and d_entry.get('output') and old[0] == d_entry['output']:
+            d_pages[outputfile] = old
+        else:
+            if verbose:
+                print(f'Finding CSS usage: {outputfile}')
+            d_pages[outputfile] = [d_entry.get('output', ''), sorted(prunecss.getusage(f'{outputdir}/{outputfile}'))]
+            numparsed += 1
+
+    s_used = set([j for i in d_pages.values() for j in i[1]]) | getextrausage()
+
+    l_used = sorted(s_used)
+    changed = l_used != d_cache['used']
+
+    os.makedirs(os.path.dirname(usagefile), exist_ok=True)
+    with open(usagefile, 'w') as f:
+        json.dump({'pages': d_pages, 'used': l_used}, f)
+
+    print(f'CSS usage: {len(l_used)} elements, classes, and ids ({numparsed} pages parsed)')
+
+    return changed
+
+def getassetcombos(l_pages):
+    """
+    Get the distinct combinations of CSS files (and of JS files) linked by pages
+
+    :param l_pages: (list of dicts) the page objects
+    :returns: (dict) a dict whose keys are "css" and "js" and whose values are sets of tuples of files
+    :rtype: dict
+    """
+
+    # The common props (e.g., of the error page) link only BASE_CSS and BASE_JS
+    d_combos = {
+        'css': {tuple(BASE_CSS)},
+        'js': {tuple(BASE_JS)}
     }
 
+    for i in l_pages:
+        d_combos['css'].add(tuple(BASE_CSS + d_TYPE2CSS.get(i['type'], []) + d_URL2CSS.get(i['url'], [])))
+        d_combos['js'].add(tuple(BASE_JS + d_TYPE2JS.get(i['type'], []) + d_URL2JS.get(i['url'], [])))
+
+    return d_combos
+
+def getcontentfiles(datadir):
+    """
+    :param datadir: (str) path to the data directory
+    :returns: (list) the content json files, or the content database if CONTENTDB is set
+    :rtype: list
+    """
+
+    if CONTENTDB:
+        return [f'{datadir}/{CONTENTDB}']
+
+    return [
+        f'{datadir}/content.sections.json',
+        f'{datadir}/content.visual.json',
+        f'{datadir}/content.article.json'
+    ]
+
+def getsnapshotkey(l_rawjson, strict=True):
+    """
+    Get the key of the content snapshot: a hash of everything
+    the derived content data structures depend on
+
+    :param l_rawjson: (list) the raw bytes of the content json files (or of the content database)
+    :param strict: (bool) if True, throw errors
+    :returns: (str) the key
+    :rtype: str
+    """
+
+    # The code which creates the data structures
+    l_code = []
+    scriptdir = os.path.dirname(os.path.abspath(__file__))
+    for i in ['jinjagen.py', 'pageobject.py', 'validate.py', 'contentdb.py', 'siteconfig.py']:
+        with open(f'{scriptdir}/{i}', 'rb') as f:
+            l_code.append(hashlib.sha256(f.read()).hexdigest())
+
+    return hashobj({
+        'version': VERSION,
+        'content': [hashlib.sha256(i).hexdigest() for i in l_rawjson],
+        'config': {i: globals()[i] for i in SNAPSHOT_CONFIG_KEYS},
+        'strict': strict,
+        'code': l_code
+    })
+
+def loadsnapshot(outputdir, key, verbose=False):
+    """
+    Load the content snapshot saved by the last build
+
+    :param outputdir: (str) path to the output directory
+    :param key: (str) the key of the current content (see getsnapshotkey())
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) the content data structures, or None if there's no snapshot or it's out of date
+    :rtype: dict
+    """
+
+    import pickle
+
+    try:
+        with open(f'{outputdir}/{CACHEDIR}/{SNAPSHOT}', 'rb') as f:
+            # The key comes first, so an out of date snapshot isn't loaded in full
+            if pickle.load(f) != key:
+                if verbose:
+                    print('Content snapshot out of date')
+                return None
+            return pickle.load(f)
+    except:
+        return None
+
+def savesnapshot(outputdir, key, d_content):
+    """
+    Save the content snapshot, for the next build
+
+    :param outputdir: (str) path to the output directory
+    :param key: (str) the key of the content (see getsnapshotkey())
+    :param d_content: (dict) the content data structures (see createcontent())
+    """
+
+    import pickle
+
+    os.makedirs(f'{outputdir}/{CACHEDIR}', exist_ok=True)
+    writefileatomic(
+        f'{outputdir}/{CACHEDIR}/{SNAPSHOT}',
+        pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL) + pickle.dumps(d_content, protocol=pickle.HIGHEST_PROTOCOL)
+    )
+
+def createcontent(contentsectionjson, contentvisjson, contentarticlejson, db=None, strict=True, verbose=False):
+    """
+    Check the content json for errors, and create the data structures derived from it:
+    the published page objects, the feeds, the category dicts, the nav dicts, etc.
+    These only depend on the content json and a few constants in dataconfig.py
+    (see SNAPSHOT_CONFIG_KEYS), so they can be saved in a snapshot
+
+    :param contentsectionjson: (list of dicts) the sections, from content.sections.json
+    :param contentvisjson: (list of dicts) the visual posts, from content.visual.json
+    :param contentarticlejson: (list of dicts) the article posts, from content.article.json
+    :param db: (sqlite3.Connection) if set, the content database (see contentdb.py) the page objects
+        came from: the feeds, selected posts, and category dicts then come from its (indexed) queries
+    :param strict: (bool) if True, throw errors
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) the content data structures, including the errors found ("l_errors")
+    :rtype: dict
+    """
+
+    ## Check for errors
+
+    # Collect every error, rather than stopping at the first one
+    # (reserved urls, types, required fields, and dates are checked in one pass)
+    validator = validate.Validator(strict = strict)
+    validator.addpages(l_SPECIAL_PAGES, 'special')
+    validator.addpages(contentsectionjson, 'section')
+    validator.addpages(contentvisjson, 'post')
+    validator.addpages(contentarticlejson, 'post')
+
+    # Check for url and category uniqueness
+    validator.checkuniq('url')
+    validator.checkuniq('category')
+
+    # Some errors (e.g., missing fields) must be fixed before the data structures can be built
+    if validator.hasfatal():
+        validator.report()
+
+    ## Create various data structures
+
     # Filter out unpublished, tweak, add urlpath attribute
     specialjson_pub = filterandtweakjson(l_SPECIAL_PAGES, HOMEPAGE)
     sectionsjson_pub = filterandtweakjson(contentsectionjson, HOMEPAGE)
@@ -1205,20 +2418,36 @@ if __name__ == "__main__":
     # Dict for all published stuff
     d_all_pub = {i['url']:i for i in l_all_pub}
 
-    # List of all published section urls
-    l_section_url_pub = [i['url'] for i in sectionsjson_pub]
+    if db is None:
+        # Get feeds (i.e., most recent posts)
+        l_feed_vis = createfeed(postvisjson_pub, NUMPOSTSFEED)
+        l_feed_article = createfeed(postarticlejson_pub, NUMPOSTSFEED)
 
-    # Get feeds (i.e., most recent posts)
-    l_feed_vis = createfeed(postvisjson_pub, NUMPOSTSFEED)
-    l_feed_article = createfeed(postarticlejson_pub, NUMPOSTSFEED)
+        # Get selected posts
+        l_selected_vis = [i for i in postvisjson_pub if i['selected']]
+        l_selected_article = [i for i in postarticlejson_pub if i['selected']]
+
+        # Create category dicts (mapping the categories to their associated posts)
+        d_vis_category2posts = createcategorydict(postvisjson_pub, verbose = verbose)
+        d_article_category2posts = createcategorydict(postarticlejson_pub, verbose = verbose)
+    else:
+        # Ditto, but via the database's queries, which return url keys
+        import contentdb
+        d_vis_pub = {i['url']:i for i in postvisjson_pub}
+        d_article_pub = {i['url']:i for i in postarticlejson_pub}
 
-    # Get selected posts
-    l_selected_vis = [i for i in postvisjson_pub if i['selected']]
-    l_selected_article = [i for i in postarticlejson_pub if i['selected']]
+        l_feed_vis = [d_vis_pub[i] for i in contentdb.getfeed(db, 'visual', NUMPOSTSFEED)]
+        l_feed_article = [d_article_pub[i] for i in contentdb.getfeed(db, 'article', NUMPOSTSFEED)]
 
-    # Create category dicts (mapping the categories to their associated posts)
-    d_vis_category2posts = createcategorydict(postvisjson_pub, verbose = args.verbose)
-    d_article_category2posts = createcategorydict(postarticlejson_pub, verbose = args.verbose)
+        l_selected_vis = [d_vis_pub[i] for i in contentdb.getselected(db, 'visual')]
+        l_selected_article = [d_article_pub[i] for i in contentdb.getselected(db, 'article')]
+
+        d_vis_category2posts = {
+            k: [d_vis_pub[i] for i in v] for k, v in contentdb.getcategories(db, 'visual').items()
+        }
+        d_article_category2posts = {
+            k: [d_article_pub[i] for i in v] for k, v in contentdb.getcategories(db, 'article').items()
+        }
 
     # Get category lists for article flavor and visual flavor
     l_category_vis = []
@@ -1233,81 +2462,258 @@ if __name__ == "__main__":
     d_nav_vis = createnavarrowsbysection(d_vis_category2posts)
     d_nav_article = createnavarrowsbysection(d_article_category2posts)
 
+    # Create the page objects for pages 2, 3, etc. of paginated section pages
+    l_paginated_pub = []
+    for i in l_all_pub:
+        l_posts, _ = getsectionposts(i, d_vis_category2posts, d_article_category2posts, l_feed_vis, l_selected_vis)
+        l_paginated_pub.extend(createpaginatedpages(i, len(l_posts), getpagesize(i['url'])))
+
+    # Create a set of Latest Feed page objects
+    l_latest = []
+    d_nav_latest = dict()
+    if LATESTFEED:
+        for idx, i in enumerate(l_feed_vis):
+            l_latest.append(i.override({
+                # Remap urlpath to lastest/1, latest/2, latest/3, etc.
+                'urlpath': f'latest/{str(idx + 1)}',
+                'showdate': 1,
+                'ishomepage': False,
+                # The page duplicates the post's own page (see DUPLICATES)
+                'canonical': i['urlpath']
+            }))
+
+        # Create nav dict
+        d_nav_latest = createnavarrowsbysection({'latest': l_latest})
+
+    ## More error checking
+
+    # Check for urlpath uniqueness (including the paginated pages)
+    validator.adduniq(l_all_pub + l_paginated_pub, 'urlpath')
+    validator.checkuniq('urlpath')
+
+    return {
+        'l_errors': validator.l_errors,
+        'specialjson_pub': specialjson_pub,
+        'postvisjson_pub': postvisjson_pub,
+        'postarticlejson_pub': postarticlejson_pub,
+        'l_all_pub': l_all_pub,
+        'd_all_pub': d_all_pub,
+        'l_paginated_pub': l_paginated_pub,
+        'l_latest': l_latest,
+        'd_vis_category2posts': d_vis_category2posts,
+        'd_article_category2posts': d_article_category2posts,
+        'l_category_vis': l_category_vis,
+        'l_category_article': l_category_article,
+        'd_nav_vis': d_nav_vis,
+        'd_nav_article': d_nav_article,
+        'd_nav_latest': d_nav_latest,
+        'l_feed_vis': l_feed_vis,
+        'l_feed_article': l_feed_article,
+        'l_selected_vis': l_selected_vis,
+        'l_selected_article': l_selected_article
+    }
+
+def loadcontent(datadir, outputdir, strict=True, verbose=False):
+    """
+    Get the content data structures (see createcontent()): from the snapshot
+    saved by the last build if the content json files, the relevant constants
+    in dataconfig.py, and the code haven't changed; otherwise, from scratch
+    (then save a new snapshot)
+
+    :param datadir: (str) path to the data directory
+    :param outputdir: (str) path to the output directory
+    :param strict: (bool) if True, throw errors
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) the content data structures
+    :rtype: dict
+    """
+
+    ## Read data
+
+    # The content json files (or the content database, if CONTENTDB is set)
+    l_rawjson = []
+    for i in getcontentfiles(datadir):
+        with open(i, 'rb') as f:
+            l_rawjson.append(f.read())
+
+    key = getsnapshotkey(l_rawjson, strict = strict)
+
+    if not FORCE:
+        d_content = loadsnapshot(outputdir, key, verbose = verbose)
+        if d_content is not None:
+            if verbose:
+                print('Loaded content snapshot')
+            return d_content
+
+    db = None
+    if CONTENTDB:
+        import contentdb
+        db = contentdb.connect(f'{datadir}/{CONTENTDB}')
+        # Get sections, visual posts (imgs and video), and article posts
+        contentsectionjson, contentvisjson, contentarticlejson = contentdb.readcontent(db)
+    else:
+        # Ditto
+        contentsectionjson, contentvisjson, contentarticlejson = [json.loads(i) for i in l_rawjson]
+
+    d_content = createcontent(
+        contentsectionjson,
+        contentvisjson,
+        contentarticlejson,
+        db = db,
+        strict = strict,
+        verbose = verbose
+    )
+
+    if db is not None:
+        db.close()
+
+    savesnapshot(outputdir, key, d_content)
+
+    return d_content
+
+def preparesite(templatepath, datadir, outputdir, assets=None, strict=True, verbose=False):
+    """
+    Read the content json files, check them for errors, and create
+    the data structures needed to build the pages: the published page objects,
+    the feeds, the category dicts, the nav dicts, the common props, etc.
+
+    :param templatepath: (str) path to the directory containing templates
+    :param datadir: (str) path to the data directory
+    :param outputdir: (str) path to the output directory
+    :param assets: (AssetIndex) the asset index (if None, it's loaded from the cache)
+    :param strict: (bool) if True, throw errors
+    :param verbose: (bool) if True, print stuff
+    :returns: (dict) a dict of the site's data structures (shared by every page)
+    :rtype: dict
+    """
+
+    # The data structures derived from the content json (possibly from the snapshot)
+    d_content = loadcontent(datadir, outputdir, strict = strict, verbose = verbose)
+
+    l_all_pub = d_content['l_all_pub']
+    d_all_pub = d_content['d_all_pub']
+    postvisjson_pub = d_content['postvisjson_pub']
+    l_feed_vis = d_content['l_feed_vis']
+
     ## More error checking
 
-    # Check for urlpath uniqueness
-    errorcheckuniq(l_all_pub, attr = 'urlpath', verbose = args.verbose)
+    # The index of the asset files: each directory is read once,
+    # rather than checking each file with its own stat call
+    if assets is None:
+        assets = assetindex.AssetIndex.load(f'{outputdir}/{CACHEDIR}/{ASSETINDEX}')
+
+    # Start with the errors in the content json
+    validator = validate.Validator(strict = strict, assets = assets)
+    validator.l_errors.extend(d_content['l_errors'])
+
+    # Misc errors
+    for i in d_SOCIALMEDIA.keys():
+        validator.check(i in ALLOWED_SOCIAL, 'social', f'Found unrecognized social media type: {i}')
+    validator.check(DUPLICATES in ALLOWED_DUPLICATES, 'config', f'Found unrecognized DUPLICATES: {DUPLICATES}')
 
     # Check for existence of img files, in both data directory and output directory
-    # See: https://stackoverflow.com/questions/952914/how-do-i-make-a-flat-list-out-of-a-list-of-lists
-    checkpath(f'{datadir}/published/img', [i['thumbnail'] for i in postvisjson_pub])
-    checkpath(f'{datadir}/published/img', sum([i['files'] for i in postvisjson_pub if i['type'] == 'img'], []))
-    checkpath(f'{datadir}/published/video', sum([i['files'] for i in postvisjson_pub if i['type'] == 'video'], []))
-    checkpath(f'{outputdir}/static/img', [i['thumbnail'] for i in postvisjson_pub])
-    checkpath(f'{outputdir}/static/img', sum([i['files'] for i in postvisjson_pub if i['type'] == 'img'], []))
-    checkpath(f'{outputdir}/static/video', sum([i['files'] for i in postvisjson_pub if i['type'] == 'video'], []))
+    l_thumbnails = [i['thumbnail'] for i in postvisjson_pub]
+    l_imgs = [j for i in postvisjson_pub if i['type'] == 'img' for j in i['files']]
+    l_videos = [j for i in postvisjson_pub if i['type'] == 'video' for j in i['files']]
+    for mydirectory in [f'{datadir}/published', f'{outputdir}/static']:
+        validator.checkfiles(f'{mydirectory}/img', l_thumbnails + l_imgs)
+        validator.checkfiles(f'{mydirectory}/video', l_videos)
     # Check for templates
-    checkpath(templatepath, list(d_TYPE2TEMPLATE.values()))
-    checkpath(templatepath, [i['template'] for i in l_all_pub if i.get('template')])
+    validator.checkfiles(templatepath, list(d_TYPE2TEMPLATE.values()) + [i['template'] for i in l_all_pub if i.get('template')])
+    if DUPLICATES == 'alias':
+        validator.checkfiles(templatepath, [d_TYPE2TEMPLATE.get('alias', ALIAS_TEMPLATE)])
 
-    # todo: make this section- and post-specific (now they're jumbled together)
-    for i in d_all.values():
-        assert i['type'], f'Missing type for page object: {i}'
-        assert i['type'] in ALLOWED_TYPES, f'Unknown type for page object: {i}'
-
-    assert HOMEPAGE, f'Homepage not found'
-    assert SIDEBAR, f'Sidebar not found'
-    assert HOMEPAGE in d_all_pub.keys(), f'Homepage url: {HOMEPAGE} not found'
+    validator.check(HOMEPAGE, 'config', 'Homepage not found')
+    validator.check(SIDEBAR, 'config', 'Sidebar not found')
+    validator.check(HOMEPAGE in d_all_pub, 'config', f'Homepage url: {HOMEPAGE} not found')
     if HOMELINK:
-        assert HOMELINK in d_all_pub.keys(), f'Homelink url: {HOMELINK} not found'
+        validator.check(HOMELINK in d_all_pub, 'config', f'Homelink url: {HOMELINK} not found')
     for i in SIDEBAR:
-        assert i in d_all_pub.keys(), f'Sidebar url: {i} not found'
+        validator.check(i in d_all_pub, 'config', f'Sidebar url: {i} not found')
 
     # todo: implement feed for articles as well
-    if HOMEPAGE == 'latest' or 'feed' in d_all_pub.keys():
-        assert len(l_feed_vis) > 0, 'Feed is empty'
+    if HOMEPAGE == 'latest' or 'feed' in d_all_pub:
+        validator.check(len(l_feed_vis) > 0, 'feed', 'Feed is empty')
 
     # Check for existence of CSS and JS files
-    cssfiles = [i for i in list(d_TYPE2CSS.values()) + list(d_URL2CSS.values())]
-    cssfiles.append(BASE_CSS)
-    cssfiles = sum(cssfiles, [])
-    # print(cssfiles)
-    jsfiles = [i for i in list(d_TYPE2JS.values()) + list(d_URL2JS.values())]
-    jsfiles.append(BASE_JS)
-    jsfiles = sum(jsfiles, [])
-    # print(jsfiles)
-    checkpath(outputdir, cssfiles, verbose=args.verbose)
-    checkpath(outputdir, jsfiles, verbose=args.verbose)
+    validator.checkfiles(outputdir, getcssjsfiles(), verbose=verbose)
     if AVATAR:
-        if not os.path.isfile(f'{outputdir}/{AVATAR}'):
+        if not assets.exists(outputdir, AVATAR):
             color.warnprint(f'WARNING: file not found: {outputdir}/{AVATAR}')
     if FAVICON:
-        if not os.path.isfile(f'{outputdir}/{FAVICON}'):
+        if not assets.exists(outputdir, FAVICON):
             color.warnprint(f'WARNING: file not found: {outputdir}/{FAVICON}')
     else:
         color.warnprint(f'WARNING: No favicon')
 
-    # Check all keys exist
-    errorchecksectionfields(sectionsjson_pub, strict=strict)
-    errorcheckpostfields(postvisjson_pub, strict=strict)
-    errorcheckpostfields(postarticlejson_pub, strict=strict)
+    # Write the sprite of the social media icons (before fingerprinting, so it's fingerprinted too)
+    if SOCIALSPRITE and not validator.l_errors:
+        writesocialsprite(templatepath, outputdir, assets)
+
+    # Prune the CSS the site doesn't use, as found by the last build (see updatecssusage()).
+    # This comes first, so the fingerprints and bundles are of the pruned CSS
+    if PRUNECSS and not validator.l_errors:
+        s_used = loadcssusage(outputdir)
+        if s_used is not None:
+            import prunecss
+            prunecss.prunefiles(
+                outputdir,
+                [i for i in getcssjsfiles() if i.endswith('.css')],
+                s_used,
+                assets,
+                f'{outputdir}/{CACHEDIR}',
+                verbose = verbose
+            )
+
+    # Fingerprint the static assets (see the asset() template helper)
+    d_assetmap = dict()
+    if FINGERPRINT and not validator.l_errors:
+        import fingerprint
+        d_assetmap = fingerprint.fingerprintassets(outputdir, assets, f'{outputdir}/{CACHEDIR}', verbose = verbose)
+
+    # Bundle the CSS and JS of each distinct combination linked by pages
+    d_bundles = dict()
+    if BUNDLE and not validator.l_errors:
+        import bundle
+        d_bundles = bundle.createbundles(
+            outputdir,
+            getassetcombos(l_all_pub + d_content['l_paginated_pub'] + d_content['l_latest']),
+            assets,
+            verbose = verbose
+        )
+        # Bundles are named by their content, so they're already fingerprinted
+        if FINGERPRINT:
+            d_assetmap.update({j: j for i in d_bundles.values() for j in i.values()})
+
+    # The hashes of the CSS files, which the critical CSS depends on (see getcriticalcss())
+    d_csshashes = dict()
+    if CRITICALCSS and not validator.l_errors:
+        d_csshashes = {i: assets.gethash(outputdir, i.lstrip('/')) for i in getcssjsfiles() if i.endswith('.css')}
+
+    # Keep the index for next time (even if there were errors)
+    assets.save(f'{outputdir}/{CACHEDIR}/{ASSETINDEX}')
+
+    # Print every error found (if any) and stop
+    validator.report()
 
     # Check categories for visual and articleposts
-    checkcategories(l_category_vis, postvisjson_pub, d_vis_category2posts)
-    checkcategories(l_category_article, postarticlejson_pub, d_article_category2posts)
+    checkcategories(d_content['l_category_vis'], postvisjson_pub, d_content['d_vis_category2posts'])
+    checkcategories(d_content['l_category_article'], d_content['postarticlejson_pub'], d_content['d_article_category2posts'])
 
     ## Print stuff
-    print(f'Visual post categories: {l_category_vis}')
-    print(f'Article post categories: {l_category_article}')
-    print(f"Special pages: {[i['url'] for i in specialjson_pub]}")
+    print(f"Visual post categories: {d_content['l_category_vis']}")
+    print(f"Article post categories: {d_content['l_category_article']}")
+    print(f"Special pages: {[i['url'] for i in d_content['specialjson_pub']]}")
     if 'feed' in [i['url'] for i in l_all_pub]:
         print(f'Feed length: {NUMPOSTSFEED}')
         print(f"Visual feed: {[i['url'] for i in l_feed_vis]}")
-        print(f"Article feed: {[i['url'] for i in l_feed_article]}")
+        print(f"Article feed: {[i['url'] for i in d_content['l_feed_article']]}")
     print(f"All pages: {[i['url'] for i in l_all_pub]}")
+    if d_content['l_paginated_pub']:
+        print(f"Paginated pages: {[i['urlpath'] for i in d_content['l_paginated_pub']]}")
     print()
 
-    ## Build pages
+    ## Create the props
 
     # Create sidebar
     l_sidebar = createsidebar(d_all_pub, SIDEBAR)
@@ -1333,106 +2739,534 @@ if __name__ == "__main__":
         d_CSS,
         SHOWNEWS,
         homelink = myhomelink,
-        verbose = args.verbose
+        socialsprite = SOCIALSPRITE_FILE if SOCIALSPRITE else '',
+        verbose = verbose
     )
 
-    # Build all pages
-    for i in l_all_pub:
+    return {
+        'l_all_pub': l_all_pub,
+        'd_all_pub': d_all_pub,
+        'l_paginated_pub': d_content['l_paginated_pub'],
+        'l_latest': d_content['l_latest'],
+        'd_common_props': d_common_props,
+        'd_assetmap': d_assetmap,
+        'assethash': hashobj(d_assetmap),
+        'propshash': hashobj(d_common_props),
+        'd_bundles': d_bundles,
+        'd_csshashes': d_csshashes,
+        'd_vis_category2posts': d_content['d_vis_category2posts'],
+        'd_article_category2posts': d_content['d_article_category2posts'],
+        'd_nav_vis': d_content['d_nav_vis'],
+        'd_nav_article': d_content['d_nav_article'],
+        'd_nav_latest': d_content['d_nav_latest'],
+        'l_feed_vis': l_feed_vis,
+        'l_feed_article': d_content['l_feed_article'],
+        'l_selected_vis': d_content['l_selected_vis'],
+        'l_selected_article': d_content['l_selected_article'],
+        'templatepath': templatepath,
+        'datadir': datadir,
+        'outputdir': outputdir,
+        'verbose': verbose,
+        'strict': strict
+    }
 
-        if i['url'] == DEBUG:
-            print('*** debug ***')
-            print(f"Page object: {i['url']}")
-            print(i)
-            print()
+def buildsite(d_site, jobs=1, l_outputs=None):
+    """
+    Build every page of the site (skipping the ones whose inputs haven't changed)
+    and save the build manifest
 
-        createpagewrapper(
-            i,
-            d_common_props,
-            d_vis_category2posts,
-            d_article_category2posts,
-            d_nav_vis,
-            d_nav_article,
-            l_feed_vis,
-            l_feed_article,
-            l_selected_vis,
-            l_selected_article,
-            templatepath,
-            datadir,
-            outputdir,
-            verbose=args.verbose,
-            strict=strict
-        )
+    :param d_site: (dict) the site's data structures, from preparesite()
+    :param jobs: (int) the number of processes used to render pages
+    :param l_outputs: (list) if set, only build these output files (e.g., the dirty
+        outputs from the dependency graph) plus any not built by the previous build
+    """
+
+    global l_log_global
+    global d_manifest_global
+    global d_templatehash_global
+    global d_templatechain_global
+    global d_constant_global
+    global d_card_global
+    global d_shared_global
+
+    # Start from scratch (this matters in watch mode, where the site is built many times)
+    l_log_global = []
+    d_manifest_global = dict()
+    d_templatehash_global = dict()
+    d_templatechain_global = dict()
+    d_constant_global = dict()
+    d_card_global = dict()
+    d_shared_global = d_site
+
+    # All pages (and pages 2, 3, etc. of paginated section pages)
+    l_tasks = [('post', i) for i in d_site['l_all_pub'] + d_site['l_paginated_pub']]
 
     # If DUPLICATEHOME, duplicate the homepage so it exists
     # both at the root url path as well as at the location
     # at its url attr
     if DUPLICATEHOME:
-        print('Duplicating homepage...')
-        # Copy the page object and create it at its ordinary url path
-        d_page = d_all_pub[HOMEPAGE]
-        mypage = d_page.copy()
-        mypage['ishomepage'] = False
-        # Hack to ensure page not created at root URL path
-        mypage['urlpath'] = mypage['urlpathnonempty']
+        # Create the page object at its ordinary url path
+        d_page = d_site['d_all_pub'][HOMEPAGE]
+        mypage = d_page.override({
+            'ishomepage': False,
+            # Hack to ensure page not created at root URL path
+            'urlpath': d_page['urlpathnonempty'],
+            # The page duplicates the homepage (see DUPLICATES)
+            'canonical': ''
+        })
+        l_tasks.append(('post', mypage))
+
+    # The Latest Feed pages
+    # Note: these must be built after the other pages,
+    # since latest/1 overwrites the 'latest' special page
+    l_tasks_latest = [('latest', i) for i in d_site['l_latest']]
+
+    # Render each output file once: drop the pages the Latest Feed overwrites
+    # (e.g., the 'latest' special page, at latest/1), rather than rendering them for nothing
+    s_latest = {getoutputfile(i['urlpath']) for _, i in l_tasks_latest}
+    l_tasks = [i for i in l_tasks if getoutputfile(i[1]['urlpath']) not in s_latest]
+
+    # Every output file of the site
+    s_expected = {getoutputfile(i['urlpath']) for _, i in l_tasks + l_tasks_latest}
+    s_expected.add('error.html')
+
+    # If only building some outputs, also build the ones the previous build didn't
+    s_outputs = s_expected
+    if l_outputs is not None:
+        s_outputs = set(l_outputs) | {i for i in s_expected if i not in d_manifest_prev_global}
+        l_tasks = [i for i in l_tasks if getoutputfile(i[1]['urlpath']) in s_outputs]
+        l_tasks_latest = [i for i in l_tasks_latest if getoutputfile(i[1]['urlpath']) in s_outputs]
+
+    # Create the jinja env (shared by every page of this build) and compile the templates.
+    # Forked worker processes inherit the compiled templates
+    env = getenv(d_site['templatepath'], f"{d_site['outputdir']}/{CACHEDIR}")
+    for i in set(list(d_TYPE2TEMPLATE.values()) + [i['template'] for i in d_site['l_all_pub'] if i.get('template')]):
+        env.get_template(i)
+
+    # If parallel, start the worker processes
+    pool = None
+    if jobs > 1 and len(l_tasks) > 1:
+        import multiprocessing
+        print(f'Rendering pages with {jobs} processes')
+        # Flush, so forked workers don't inherit (and re-print) unflushed output
+        sys.stdout.flush()
+        pool = multiprocessing.Pool(
+            processes = jobs,
+            initializer = initworker,
+            initargs = (d_site, d_manifest_prev_global, FORCE)
+        )
 
-        createpagewrapper(
-            mypage,
-            d_common_props,
-            d_vis_category2posts,
-            d_article_category2posts,
-            d_nav_vis,
-            d_nav_article,
-            l_feed_vis,
-            l_feed_article,
-            l_selected_vis,
-            l_selected_article,
-            templatepath,
+    try:
+        # Build all pages
+        if DUPLICATEHOME:
+            print('Duplicating homepage...')
+
+        buildpages(l_tasks, pool, jobs)
+
+        # Generate error page
+        if 'error.html' in s_outputs:
+            create404(
+                d_site['d_common_props'],
+                d_site['templatepath'],
+                d_site['outputdir'],
+                verbose = d_site['verbose']
+            )
+
+        # Build the Latest Feed pages
+        if l_tasks_latest:
+            print('Creating latest feed...')
+            buildpages(l_tasks_latest, pool, jobs)
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    # Carry over the manifest entries of the outputs which weren't built
+    for i in s_expected - s_outputs:
+        d_manifest_global[i] = d_manifest_prev_global[i]
+
+    # Remove the outputs of the previous build which this build no longer has
+    # (their entries are left out of the new build manifest)
+    removestaleoutputs(d_site['outputdir'], s_expected, verbose = d_site['verbose'])
+
+    # Save the build manifest for the next build
+    savemanifest(d_site['outputdir'], d_manifest_global)
+
+    # Write the cache policy of every output file
+    if FINGERPRINT:
+        import fingerprint
+        d_policy = fingerprint.getcachepolicy(d_site['d_assetmap'], list(s_expected))
+        fingerprint.writecachepolicy(d_site['outputdir'], CACHEPOLICY, d_policy)
+
+def reprunecss(d_site, jobs=1):
+    """
+    If PRUNECSS is on, find the elements, classes, and ids used by the pages
+    just built; if they changed since the CSS was pruned, prune it again and rebuild.
+    (Only pages whose inputs changed are rebuilt: none, unless FINGERPRINT is on)
+
+    :param d_site: (dict) the site's data structures, from preparesite()
+    :param jobs: (int) the number of processes used to render pages
+    :returns: (dict) the site's data structures (new ones, if the CSS was pruned again)
+    :rtype: dict
+    """
+
+    global d_manifest_prev_global
+
+    if not PRUNECSS or not updatecssusage(d_site['outputdir'], verbose = d_site['verbose']):
+        return d_site
+
+    color.okprint('CSS usage changed: pruning the CSS again')
+
+    d_site = preparesite(
+        d_site['templatepath'],
+        d_site['datadir'],
+        d_site['outputdir'],
+        strict = d_site['strict'],
+        verbose = d_site['verbose']
+    )
+
+    # The last build is now the previous build
+    d_manifest_prev_global = d_manifest_global
+
+    buildsite(d_site, jobs=jobs)
+
+    # Record the rebuilt pages (the usage itself can't change: it doesn't depend on the CSS)
+    updatecssusage(d_site['outputdir'], verbose = d_site['verbose'])
+
+    return d_site
+
+def getinputhashes(d_site):
+    """
+    Get a hash of every input of the site which comes from the content json files
+    and dataconfig.py (the templates and the data files are handled separately).
+    Comparing two of these (see depgraph.diffinputs()) tells us which inputs changed
+
+    :param d_site: (dict) the site's data structures, from preparesite()
+    :returns: (dict) a dict whose keys are input names (see depgraph.py) and whose values are hashes
+    :rtype: dict
+    """
+
+    d_inputs = dict()
+
+    d_inputs['props'] = d_site['propshash']
+    d_inputs['assets'] = d_site['assethash']
+
+    for i in d_site['l_all_pub']:
+        d_inputs[f"page:{i['url']}"] = hashobj(i)
+
+    # For lists of posts, the membership and the order matter
+    # (changes to the posts themselves are covered by their page objects)
+    d_inputs['list:feed_vis'] = hashobj([i['url'] for i in d_site['l_feed_vis']])
+    d_inputs['list:selected_vis'] = hashobj([i['url'] for i in d_site['l_selected_vis']])
+    for k, v in d_site['d_vis_category2posts'].items():
+        d_inputs[f'list:category_vis:{k}'] = hashobj([i['url'] for i in v])
+    for k, v in d_site['d_article_category2posts'].items():
+        d_inputs[f'list:category_article:{k}'] = hashobj([i['url'] for i in v])
+
+    for flavor in ['vis', 'article', 'latest']:
+        for k, v in d_site[f'd_nav_{flavor}'].items():
+            d_inputs[f'nav:{flavor}:{k}'] = hashobj(v)
+
+    for i in CONFIG_KEYS:
+        d_inputs[f'config:{i}'] = hashobj(globals()[i])
+
+    return d_inputs
+
+def getfileinputs(l_files, templatepath, datadir):
+    """
+    Convert changed files (templates and files in the data directory)
+    to input names for the dependency graph
+
+    :param l_files: (list) a list of file paths
+    :param templatepath: (str) path to the directory containing templates
+    :param datadir: (str) path to the data directory
+    :returns: (list) a list of input names (see depgraph.py)
+    :rtype: list
+    """
+
+    l_inputs = []
+
+    for i in l_files:
+        if os.path.abspath(i).startswith(os.path.abspath(templatepath) + os.sep):
+            l_inputs.append('template:' + os.path.relpath(i, templatepath).replace(os.sep, '/'))
+        elif os.path.abspath(i).startswith(os.path.abspath(datadir) + os.sep):
+            l_inputs.append('file:' + os.path.relpath(i, datadir).replace(os.sep, '/'))
+
+    return l_inputs
+
+def writelog(logfile):
+    """
+    Write the log information (which pages use which templates, css, js, etc.)
+    to a tab-separated file
+
+    :param logfile: (str) path to the log file
+    """
+
+    import csv
+
+    # Stream the rows to the file (missing values are left empty)
+    with open(logfile, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=LOG_COLUMNS, delimiter='\t', lineterminator='\n')
+        writer.writeheader()
+        for i in l_log_global:
+            writer.writerow(i)
+
+def marktime(phase, starttime):
+    """
+    Record how long a phase took (see --timings)
+
+    :param phase: (str) the name of the phase
+    :param starttime: (float) when the phase started, from time.perf_counter()
+    :returns: (float) the current time, i.e., when the next phase starts
+    :rtype: float
+    """
+
+    now = time.perf_counter()
+    l_timings_global.append([phase, now - starttime])
+
+    return now
+
+def printtimings():
+    """
+    Print the timings recorded by marktime()
+    """
+
+    print()
+    print('Timings:')
+    for phase, seconds in l_timings_global:
+        print(f'    {phase:<24}{seconds:8.3f} s')
+    print(f"    {'total':<24}{time.perf_counter() - T_START:8.3f} s")
+
+def getwatchedfiles(templatepath, datadir):
+    """
+    Get the files that affect the pages: the templates, the content json files,
+    dataconfig.py, the news, and the content.html files of articles.
+    (Note: img and video files don't affect the pages, so there's no need to watch them)
+
+    :param templatepath: (str) path to the directory containing templates
+    :param datadir: (str) path to the data directory
+    :returns: (list) a list of files and directories
+    :rtype: list
+    """
+
+    return [
+        templatepath,
+        f'{datadir}/dataconfig.py'
+    ] + getcontentfiles(datadir) + [
+        f'{datadir}/published/news',
+        f'{datadir}/published/article'
+    ]
+
+def watchsite(
+        d_site,
+        jobs=1,
+        logfile='',
+        serve=False,
+        port=8000,
+        interval=0.2
+    ):
+    """
+    Watch the templates, the content, and dataconfig.py, and rebuild the site
+    whenever one of them changes. Everything that didn't change stays in memory:
+    if only templates or content.html files change, the content isn't re-read;
+    and the build manifest means only pages whose inputs changed get rendered.
+    If serve, also serve the output directory, and reload open browser tabs after every rebuild
+
+    :param d_site: (dict) the site's data structures, from preparesite()
+    :param jobs: (int) the number of processes used to render pages
+    :param logfile: (str) path to the log file (omit to suppress logging)
+    :param serve: (bool) if True, run the development server
+    :param port: (int) the port for the development server
+    :param interval: (float) seconds between checks for changes
+    """
+
+    import importlib
+    import devserver
+    import depgraph
+
+    global d_manifest_prev_global
+    global FORCE
+
+    templatepath = d_site['templatepath']
+    datadir = d_site['datadir']
+    outputdir = d_site['outputdir']
+
+    # The first build did everything that --force asked for
+    FORCE = False
+
+    server = None
+    if serve:
+        server = devserver.startserver(outputdir, port)
+
+    l_watched = getwatchedfiles(templatepath, datadir)
+    d_mtimes = devserver.scanfiles(l_watched)
+
+    # Snapshot of the inputs, to find out what changed
+    d_inputs = getinputhashes(d_site)
+
+    color.okprint(f'Watching for changes (ctrl-c to stop) ...')
+
+    try:
+        while True:
+            time.sleep(interval)
+
+            d_mtimes_new = devserver.scanfiles(l_watched)
+            l_changed = devserver.changedfiles(d_mtimes, d_mtimes_new)
+            if not l_changed:
+                continue
+            d_mtimes = d_mtimes_new
+
+            print()
+            print(f'Changed: {l_changed}')
+            starttime = time.time()
+
+            try:
+                # If the config changed, re-import it
+                if f'{datadir}/dataconfig.py' in l_changed:
+                    importlib.reload(sys.modules['dataconfig'])
+                    setupglobals()
+
+                # Templates and data files (e.g., content.html) are inputs in their own right
+                l_inputs_changed = getfileinputs(l_changed, templatepath, datadir)
+
+                # Only re-read the content if the config, content json, or news changed.
+                # (Templates and content.html files are picked up when the pages are built)
+                if [i for i in l_changed if not i.startswith(f'{templatepath}/') and not i.startswith(f'{datadir}/published/article/')]:
+                    d_site = preparesite(
+                        templatepath,
+                        datadir,
+                        outputdir,
+                        strict = d_site['strict'],
+                        verbose = d_site['verbose']
+                    )
+                    d_inputs_new = getinputhashes(d_site)
+                    l_inputs_changed.extend(depgraph.diffinputs(d_inputs, d_inputs_new))
+                    d_inputs = d_inputs_new
+
+                # Use the dependency graph of the last build to find the dirty pages
+                graph = depgraph.DepGraph.frommanifest(d_manifest_global)
+                l_dirty = sorted(graph.dirty(l_inputs_changed))
+                print(f'Changed inputs: {l_inputs_changed}')
+                print(f'Pages to rebuild: {len(l_dirty)}')
+
+                # The last build is now the previous build
+                d_manifest_prev_global = d_manifest_global
+
+                buildsite(d_site, jobs=jobs, l_outputs=l_dirty)
+
+                # Prune the CSS again, if the pages use different elements, classes, or ids
+                if PRUNECSS:
+                    d_site = reprunecss(d_site, jobs=jobs)
+                    d_inputs = getinputhashes(d_site)
+
+                if logfile:
+                    writelog(logfile)
+            except Exception as e:
+                # Don't stop watching just because of a mistake in the content
+                color.errorprint(f'ERROR: {type(e).__name__}: {e}')
+                continue
+
+            color.okprint(f'Rebuilt in {time.time() - starttime:.2f} s')
+
+            if server is not None:
+                server.notifyreload()
+    except KeyboardInterrupt:
+        print()
+
+    if server is not None:
+        server.shutdown()
+
+#-------------------------------------------------------------------------------
+#   Main
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+
+    ### Generate pages with Jinja
+
+    starttime = marktime('imports', T_START)
+
+    args = getarg()
+
+    # Path to templates directory
+    templatepath = args.templates
+    # Path to data directory
+    datadir = args.data
+    # Path to output directory
+    outputdir = args.outputdir
+    # strict
+    strict = not args.nostrict
+
+    # If True, rebuild every page regardless of the build manifest
+    FORCE = args.force
+
+    # Import constants, found in datadir/dataconfig.py
+    sys.path.append(datadir)
+    setupglobals(verbose=True)
+    starttime = marktime('read dataconfig.py', starttime)
+
+    # The index of the asset files (see assetindex.py)
+    assets = assetindex.AssetIndex.load(f'{outputdir}/{CACHEDIR}/{ASSETINDEX}')
+
+    # Minify and copy the static assets (only the new or changed ones)
+    if args.assets:
+        import addassets
+        addassets.addassets(
             datadir,
             outputdir,
-            verbose=args.verbose,
-            strict=strict
+            args.static,
+            assets,
+            f'{outputdir}/{CACHEDIR}/{MINIFIED}',
+            l_referenced = getcssjsfiles(),
+            hardlink = args.hardlink,
+            force = FORCE,
+            verbose = args.verbose
         )
+        starttime = marktime('copy assets', starttime)
 
-    # Generate error page
-    create404(
-        d_common_props,
+    # Read data, check for errors, and create various data structures
+    d_site = preparesite(
         templatepath,
+        datadir,
         outputdir,
+        assets = assets,
+        strict = strict,
         verbose = args.verbose
     )
+    starttime = marktime('read content', starttime)
 
-    # Build a set of Latest Feed pages
-    if LATESTFEED:
-        print('Creating latest feed...')
-        l_latest = []
-        for idx, i in enumerate(l_feed_vis):
-            j = i.copy()
-            # Remap urlpath to lastest/1, latest/2, latest/3, etc.
-            j['urlpath'] = f'latest/{str(idx + 1)}'
-            j['showdate'] = 1
-            j['ishomepage'] = False
-            l_latest.append(j)
+    # Load the build manifest from the previous build
+    d_manifest_prev_global = loadmanifest(outputdir, verbose = args.verbose)
+    starttime = marktime('load manifest', starttime)
 
-        # Create nav dict
-        d_nav_latest = createnavarrowsbysection({'latest': l_latest})
+    ## Build pages
 
-        for i in l_latest:
-            createpage(
-                i,
-                d_common_props,
-                d_nav_latest,
-                templatepath,
-                datadir,
-                outputdir,
-                addjs = d_TYPE2JS.get(i['type'], []) + d_URL2JS.get(i['url'], []),
-                addcss = d_TYPE2CSS.get(i['type'], []) + d_URL2CSS.get(i['url'], []),
-                xtemplate = i.get('template', ''),
-                marker = 'specialpage',
-                verbose = args.verbose,
-                strict=strict
-            )
+    buildsite(d_site, jobs = args.jobs)
+    starttime = marktime('build pages', starttime)
+
+    # Prune the CSS again, if the pages use different elements, classes, or ids than last time
+    if PRUNECSS:
+        d_site = reprunecss(d_site, jobs = args.jobs)
+        starttime = marktime('prune CSS', starttime)
 
     # Logging
     if args.logfile:
-        df = pd.DataFrame(data=l_log_global)
-        df.to_csv(args.logfile, sep="\t", index=False)
+        writelog(args.logfile)
+        starttime = marktime('write log', starttime)
+
+    if args.timings:
+        printtimings()
+
+    # Watch for changes, and rebuild
+    if args.watch or args.serve:
+        watchsite(
+            d_site,
+            jobs = args.jobs,
+            logfile = args.logfile,
+            serve = args.serve,
+            port = args.port
+        )
@@ -0,0 +1,408 @@
+#-------------------------------------------------------------------------------
+#
+#    minify.py
+#
+#    Minify CSS, JS, and HTML, in Python (no need for uglifycss or uglifyjs).
+#    These are conservative minifiers: they strip comments and needless
+#    whitespace, but don't rename anything. Strings (and, in JS, regex
+#    and template literals) are left alone, as are comments of the form /*! ... */
+#    (e.g., licenses). JS keeps its line breaks, so automatic semicolon
+#    insertion works the same as in the original.
+#    HTML is minified in a single pass over a stream of chunks (e.g., from
+#    Jinja's generate()), so a whole page never has to be held in memory
+#
+#-------------------------------------------------------------------------------
+
+import re
+
+# CSS strings and comments
+CSS_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*[\s\S]*?\*/)')
+
+# Whitespace around CSS punctuation
+CSS_PUNCT_RE = re.compile(r'\s*([{};,>])\s*')
+
+# An HTML tag, up to its closing ">" (which may not be inside a quoted attribute)
+HTML_TAG_RE = re.compile(r'<[^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*>')
+
+# The name of an HTML tag
+HTML_TAGNAME_RE = re.compile(r'</?([a-zA-Z][a-zA-Z0-9-]*)')
+
+# HTML text: runs of whitespace, and runs of anything else
+HTML_TEXT_RE = re.compile(r'(\s+)|([^\s]+)')
+
+# HTML elements whose content is kept exactly as is
+HTML_RAW_TAGS = frozenset(['pre', 'textarea', 'script', 'style'])
+
+# HTML elements which aren't laid out inline: whitespace between two of them
+# never shows, so it's dropped (elsewhere, whitespace is only collapsed)
+HTML_BLOCK_TAGS = frozenset([
+    '!doctype', 'html', 'head', 'body', 'title', 'meta', 'link', 'base', 'style', 'script', 'noscript',
+    'div', 'p', 'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'nav', 'header', 'footer', 'main',
+    'section', 'article', 'aside', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'pre',
+    'blockquote', 'figure', 'figcaption', 'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th',
+    'form', 'fieldset', 'address', 'details', 'summary'
+])
+
+# The comment in every page with the SimpleSiteGenerator version (see fragment.headtag.html)
+HTML_BANNER = '<!-- Built with SimpleSiteGenerator'
+
+# Ordinary JS code: anything but quotes, slashes, and whitespace
+JS_CODE_RE = re.compile(r'[^"\'`/\s]+')
+
+# A "/" after one of these characters (or keywords) starts a JS regex, not a division
+JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+JS_REGEX_KEYWORDS = {
+    'return', 'typeof', 'case', 'in', 'of', 'delete', 'void',
+    'throw', 'new', 'instanceof', 'else', 'do', 'yield', 'await'
+}
+
+def minifycss(x):
+    """
+    Minify CSS. Strings are kept as they are, punctuation and all, e.g.:
+
+    >>> minifycss('a::after { content: "x , y ; } z"; }')
+    'a::after{content: "x , y ; } z"}\\n'
+
+    :param x: (str) CSS
+    :returns: (str) the minified CSS
+    :rtype: str
+    """
+
+    l = []
+    # The CSS between strings (and kept comments), dropped comments and all
+    l_chunk = []
+    pos = 0
+
+    def minifychunk(chunk):
+        chunk = re.sub(r'\s+', ' ', chunk)
+        chunk = CSS_PUNCT_RE.sub(r'\1', chunk)
+        # Drop the last semicolon of each block
+        return chunk.replace(';}', '}')
+
+    for m in CSS_TOKEN_RE.finditer(x):
+        l_chunk.append(x[pos:m.start()])
+        if m.group(1) or m.group(2).startswith('/*!'):
+            # A string, or a comment to keep: keep as is
+            l.append(minifychunk(''.join(l_chunk)))
+            l_chunk = []
+            l.append(m.group(0))
+        else:
+            # A comment to drop (it still separates what's on either side)
+            l_chunk.append(' ')
+        pos = m.end()
+
+    l_chunk.append(x[pos:])
+    l.append(minifychunk(''.join(l_chunk)))
+
+    return ''.join(l).strip() + '\n'
+
+def skipjsliteral(x, i):
+    """
+    Find the end of a JS string, template literal, or regex literal
+
+    :param x: (str) JS
+    :param i: (int) the index of the opening quote (or slash)
+    :returns: (int) the index just past the literal
+    :rtype: int
+    """
+
+    quote = x[i]
+    n = len(x)
+    inclass = False
+    i += 1
+
+    while i < n:
+        c = x[i]
+        if c == '\\':
+            i += 2
+            continue
+        if quote == '/':
+            # In a regex, a slash inside a character class doesn't end it
+            if c == '[':
+                inclass = True
+            elif c == ']':
+                inclass = False
+            elif c == '/' and not inclass:
+                i += 1
+                # Flags
+                while i < n and (x[i].isalnum() or x[i] == '_'):
+                    i += 1
+                return i
+            elif c == '\n':
+                return i
+        elif c == quote:
+            return i + 1
+        i += 1
+
+    return n
+
+def isjsregex(l_out):
+    """
+    :param l_out: (list) the minified JS so far
+    :returns: (bool) True if a "/" here would start a regex
+    :rtype: bool
+    """
+
+    prev = ''.join(l_out[-8:]).rstrip()
+
+    if not prev:
+        return True
+
+    if prev[-1] in JS_REGEX_AFTER:
+        return True
+
+    m = re.search(r'[A-Za-z_$][\w$]*$', prev)
+
+    return bool(m) and m.group(0) in JS_REGEX_KEYWORDS
+
+def addjsspace(l_out, space):
+    """
+    Add whitespace to the minified JS: at most one space or line break
+    between tokens (a line break wins, for automatic semicolon insertion)
+
+    :param l_out: (list) the minified JS so far (a list of tokens)
+    :param space: (str) a space or a line break
+    """
+
+    if not l_out:
+        return
+
+    if l_out[-1] in (' ', '\n'):
+        if space == '\n':
+            l_out[-1] = '\n'
+        return
+
+    l_out.append(space)
+
+def minifyjs(x):
+    """
+    :param x: (str) JS
+    :returns: (str) the minified JS
+    :rtype: str
+    """
+
+    # The tokens of the minified JS. Whitespace only ever comes in tokens of its own,
+    # so strings and other literals are never touched
+    l_out = []
+    i = 0
+    n = len(x)
+
+    while i < n:
+        c = x[i]
+        if c in '"\'`':
+            j = skipjsliteral(x, i)
+            l_out.append(x[i:j])
+            i = j
+        elif x.startswith('//', i):
+            # Line comment: drop it (but not the line break)
+            j = x.find('\n', i)
+            i = n if j == -1 else j
+        elif x.startswith('/*', i):
+            j = x.find('*/', i + 2)
+            j = n if j == -1 else j + 2
+            if x.startswith('/*!', i):
+                l_out.append(x[i:j])
+            else:
+                addjsspace(l_out, ' ')
+            i = j
+        elif c == '/' and isjsregex(l_out):
+            j = skipjsliteral(x, i)
+            l_out.append(x[i:j])
+            i = j
+        elif c in ' \t\r\n':
+            # Collapse a run of whitespace to a space or a line break
+            j = i
+            while j < n and x[j] in ' \t\r\n':
+                j += 1
+            addjsspace(l_out, '\n' if '\n' in x[i:j] else ' ')
+            i = j
+        elif c == '/':
+            # Division
+            l_out.append(c)
+            i += 1
+        else:
+            # Ordinary code, up to the next thing of interest
+            m = JS_CODE_RE.match(x, i)
+            l_out.append(m.group(0))
+            i = m.end()
+
+    return ''.join(l_out).strip() + '\n'
+
+class HTMLMinifier:
+    """
+    A streaming HTML minifier: feed it chunks of HTML, and it returns the minified HTML
+    as it goes (holding back only an incomplete tag or comment at the end of a chunk).
+    It strips comments, collapses runs of whitespace to a single space or line break,
+    and drops the whitespace between block-level tags. The content of
+    <pre>, <textarea>, <script>, and <style> is kept as is, as are tags themselves
+    """
+
+    def __init__(self, keepbanner=True):
+        """
+        :param keepbanner: (bool) if True, keep the SimpleSiteGenerator version comment
+        """
+
+        self.keepbanner = keepbanner
+        # Unprocessed input (an incomplete tag, comment, or raw element content)
+        self.buf = ''
+        # If inside a raw element (e.g., <pre>), its name
+        self.rawtag = ''
+        # Collapsed whitespace waiting to see what comes next: '', ' ', or '\n'
+        self.space = ''
+        # True if the last thing written was a block-level tag (or the start of the page)
+        self.afterblock = True
+
+    def addspace(self, myspace):
+        """
+        :param myspace: (str) a run of whitespace
+        """
+
+        # A line break wins over a space
+        if '\n' in myspace:
+            self.space = '\n'
+        elif not self.space:
+            self.space = ' '
+
+    def flushspace(self, l_out, isblock):
+        """
+        Write the pending whitespace, unless it's between two block-level tags
+
+        :param l_out: (list) the output so far
+        :param isblock: (bool) True if what comes next is a block-level tag
+        """
+
+        if self.space and not (self.afterblock and isblock):
+            l_out.append(self.space)
+        self.space = ''
+
+    def process(self, final=False):
+        """
+        Minify as much of the buffered input as possible
+
+        :param final: (bool) True if there's no more input
+        :returns: (str) the minified HTML
+        :rtype: str
+        """
+
+        l_out = []
+        x = self.buf
+        n = len(x)
+        i = 0
+
+        while i < n:
+            if self.rawtag:
+                # Keep everything up to the closing tag
+                m = re.compile(r'</%s[\s>/]' % self.rawtag, re.IGNORECASE).search(x, i)
+                if m is None:
+                    # Hold back what could be the start of the closing tag
+                    j = n if final else max(i, n - len(self.rawtag) - 3)
+                    l_out.append(x[i:j])
+                    i = j
+                    break
+                l_out.append(x[i:m.start()])
+                self.rawtag = ''
+                i = m.start()
+                continue
+
+            j = x.find('<', i)
+            if j == -1:
+                j = n
+            for m in HTML_TEXT_RE.finditer(x, i, j):
+                if m.group(1):
+                    self.addspace(m.group(1))
+                else:
+                    self.flushspace(l_out, False)
+                    l_out.append(m.group(2))
+                    self.afterblock = False
+            i = j
+            if i == n:
+                break
+
+            # A comment
+            if x.startswith('<!--', i) or (not final and '<!--'.startswith(x[i:])):
+                k = x.find('-->', i + 4)
+                if k == -1:
+                    if final:
+                        k = n - 3
+                    else:
+                        break
+                mycomment = x[i:k + 3]
+                # Keep the version banner, and conditional comments (e.g., <!--[if IE]>)
+                if (self.keepbanner and mycomment.startswith(HTML_BANNER)) or mycomment.startswith('<!--['):
+                    self.flushspace(l_out, True)
+                    l_out.append(mycomment)
+                    self.afterblock = True
+                i = k + 3
+                continue
+
+            # A tag
+            m = HTML_TAG_RE.match(x, i)
+            mytagname = HTML_TAGNAME_RE.match(x, i)
+            if m is None or not (mytagname or x.startswith('<!', i) or x.startswith('<?', i)):
+                if not final and m is None and x.find('>', i) == -1:
+                    # Maybe an incomplete tag: wait for the rest
+                    break
+                # Not a tag (e.g., a "<" in text)
+                self.flushspace(l_out, False)
+                l_out.append('<')
+                self.afterblock = False
+                i += 1
+                continue
+
+            if mytagname:
+                myname = mytagname.group(1).lower()
+            else:
+                myname = x[i + 1:m.end() - 1].split()[0].lower() if m.end() - i > 2 else ''
+            isblock = myname in HTML_BLOCK_TAGS
+            self.flushspace(l_out, isblock)
+            l_out.append(m.group(0))
+            self.afterblock = isblock
+            if myname in HTML_RAW_TAGS and not x.startswith('</', i) and not m.group(0).endswith('/>'):
+                self.rawtag = myname
+            i = m.end()
+
+        self.buf = x[i:]
+
+        return ''.join(l_out)
+
+    def feed(self, chunk):
+        """
+        :param chunk: (str) the next chunk of HTML
+        :returns: (str) the minified HTML, as far as it can be minified so far
+        :rtype: str
+        """
+
+        # Join rather than add: Jinja yields Markup chunks, and adding a str
+        # to Markup would escape the str
+        self.buf = ''.join([self.buf, chunk])
+
+        return self.process()
+
+    def close(self):
+        """
+        :returns: (str) the rest of the minified HTML (trailing whitespace is dropped)
+        :rtype: str
+        """
+
+        return self.process(final=True)
+
+def minifyhtml(chunks, keepbanner=True):
+    """
+    Minify HTML, one chunk at a time
+
+    :param chunks: (iterable) chunks of HTML (e.g., from Jinja's template.generate())
+    :param keepbanner: (bool) if True, keep the SimpleSiteGenerator version comment
+    :returns: (generator) chunks of minified HTML
+    :rtype: generator
+    """
+
+    minifier = HTMLMinifier(keepbanner = keepbanner)
+
+    for chunk in chunks:
+        myout = minifier.feed(chunk)
+        if myout:
+            yield myout
+
+    myout = minifier.close()
+    if myout:
+        yield myout
@@ -0,0 +1,207 @@
+#-------------------------------------------------------------------------------
+#
+#    pageobject.py
+#
+#    A compact type for page objects (posts, sections, and special pages).
+#    Page objects behave like the dicts read from the content json files
+#    (d_page['url'], d_page.get('template'), etc.), so templates and the rest
+#    of the code see them the same way, but they take less memory and
+#    per-page changes don't require copying the whole page object
+#
+#-------------------------------------------------------------------------------
+
+import collections.abc
+
+from siteconfig import REQUIRED_POST_FIELDS
+from siteconfig import REQUIRED_SECTION_FIELDS
+
+# The fields stored in slots: the fields in the content json files,
+# plus the ones added while building the site.
+# Any other field goes in a regular dict (d_extra)
+FIELDS = tuple(dict.fromkeys(
+    REQUIRED_POST_FIELDS + REQUIRED_SECTION_FIELDS + [
+        'template',
+        'urlpath',
+        'urlpathnonempty',
+        'ishomepage',
+        'dateparsed',
+        'pagenum',
+        'urlpathfirst',
+        'hackurl'
+    ]
+))
+
+FIELDS_SET = frozenset(FIELDS)
+
+class PageMapping:
+    """
+    The dict-like interface shared by PageObject and PageView.
+    Subclasses implement __getitem__, __setitem__, and keys()
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, key):
+        # Only called when ordinary attribute lookup fails:
+        # i.e., for unset slots and for extra fields.
+        # This lets templates use page.name as well as page['name']
+        if key.startswith('__'):
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def todict(self):
+        """
+        :returns: (dict) the page object as a plain dict (e.g., for json)
+        :rtype: dict
+        """
+
+        return dict(self.items())
+
+    def override(self, d_overrides):
+        """
+        Get the page object with some fields changed, without copying it
+
+        :param d_overrides: (dict) the fields to change
+        :returns: a view of the page object with the fields changed
+        :rtype: PageView
+        """
+
+        return PageView(self, d_overrides)
+
+class PageObject(PageMapping):
+    """
+    A page object: the fields of a post, section, or special page
+    """
+
+    __slots__ = FIELDS + ('d_extra',)
+
+    def __init__(self, d_page=None):
+        """
+        :param d_page: (dict) the fields of the page object (e.g., from the content json)
+        """
+
+        self.d_extra = dict()
+
+        if d_page:
+            for k, v in d_page.items():
+                self[k] = v
+
+    def __getitem__(self, key):
+        if key in FIELDS_SET:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        return self.d_extra[key]
+
+    def __setitem__(self, key, value):
+        if key in FIELDS_SET:
+            object.__setattr__(self, key, value)
+        else:
+            self.d_extra[key] = value
+
+    def __getattr__(self, key):
+        # Guard against recursion while unpickling (before d_extra is set)
+        if key == 'd_extra':
+            raise AttributeError(key)
+        return super().__getattr__(key)
+
+    def keys(self):
+        l_keys = []
+        for k in FIELDS:
+            try:
+                object.__getattribute__(self, k)
+                l_keys.append(k)
+            except AttributeError:
+                pass
+        return l_keys + list(self.d_extra)
+
+    def copy(self):
+        return PageObject(self.todict())
+
+class PageView(PageMapping):
+    """
+    A page object with some of its fields changed (e.g., the homepage
+    duplicated at another url path, or a page of the Latest Feed).
+    The changes are kept in their own dict, so the page object isn't copied
+    """
+
+    __slots__ = ('base', 'd_overrides')
+
+    def __init__(self, base, d_overrides):
+        """
+        :param base: (PageMapping) the page object
+        :param d_overrides: (dict) the fields to change
+        """
+
+        # Don't stack views: override the underlying page object
+        if isinstance(base, PageView):
+            d_overrides = {**base.d_overrides, **d_overrides}
+            base = base.base
+
+        self.base = base
+        self.d_overrides = dict(d_overrides)
+
+    def __getitem__(self, key):
+        if key in self.d_overrides:
+            return self.d_overrides[key]
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        self.d_overrides[key] = value
+
+    def __getattr__(self, key):
+        # Guard against recursion while unpickling (before the slots are set)
+        if key in ('base', 'd_overrides'):
+            raise AttributeError(key)
+        return super().__getattr__(key)
+
+    def keys(self):
+        l_keys = self.base.keys()
+        return l_keys + [k for k in self.d_overrides if k not in l_keys]
+
+    def copy(self):
+        return PageView(self.base, self.d_overrides)
+
+def jsondefault(x):
+    """
+    For json.dumps(): convert page objects and other mappings to dicts
+    (and anything else to a string)
+
+    :param x: an object json can't serialize
+    :returns: something it can
+    """
+
+    if isinstance(x, PageMapping):
+        return x.todict()
+
+    # E.g., layered props (collections.ChainMap)
+    if isinstance(x, collections.abc.Mapping):
+        return dict(x)
+
+    return str(x)
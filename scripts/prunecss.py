@@ -0,0 +1,265 @@
+#-------------------------------------------------------------------------------
+#
+#    prunecss.py
+#
+#    Remove the CSS rules a site doesn't use. The rendered HTML is scanned
+#    for the elements, classes, and ids it actually uses; then every rule
+#    whose selectors can't match any of them is dropped from the stylesheets.
+#    The check is conservative: a selector is only dropped if it names
+#    an element, class, or id which appears nowhere in the site
+#    (e.g., .ssg-card p is kept if .ssg-card and p are both used somewhere)
+#
+#-------------------------------------------------------------------------------
+
+import os
+import re
+import json
+import shutil
+import html.parser
+
+# At-rules which contain rules (and so can be pruned in turn).
+# Other at-rules (e.g., @font-face, @keyframes) are kept as is
+NESTED_AT_RULES = frozenset(['@media', '@supports', '@layer', '@container', '@document'])
+
+# Strings in selectors
+STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+# Attribute selectors, and the arguments of pseudo-classes (innermost first)
+ATTRIBUTE_RE = re.compile(r'\[[^\]]*\]')
+PARENS_RE = re.compile(r'\([^()]*\)')
+# Pseudo-classes and pseudo-elements
+PSEUDO_RE = re.compile(r'::?[\w-]+')
+# Classes and ids
+CLASSID_RE = re.compile(r'([.#])(-?[_a-zA-Z][\w-]*)')
+# Element names (at the start of a compound selector)
+ELEMENT_RE = re.compile(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)')
+
+class UsageParser(html.parser.HTMLParser):
+    """
+    Collect the elements, classes (as .name), and ids (as #name) used in HTML
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.s_used = set()
+
+    def handle_starttag(self, tag, attrs):
+        self.s_used.add(tag.lower())
+        for k, v in attrs:
+            if k == 'class' and v:
+                self.s_used.update(['.' + i for i in v.split()])
+            elif k == 'id' and v:
+                self.s_used.add('#' + v.strip())
+
+    handle_startendtag = handle_starttag
+
+def getusage(myfile):
+    """
+    :param myfile: (str) path to an HTML file
+    :returns: (set) the elements, classes (.name), and ids (#name) it uses
+    :rtype: set
+    """
+
+    parser = UsageParser()
+
+    with open(myfile, 'r') as f:
+        # Feed the file in chunks, rather than reading it whole
+        for chunk in iter(lambda: f.read(1 << 16), ''):
+            parser.feed(chunk)
+    parser.close()
+
+    return parser.s_used
+
+def splitrules(css):
+    """
+    Split CSS into its top-level statements
+
+    :param css: (str) CSS
+    :returns: (list) a list of (prelude, block) tuples: e.g., (".a, .b", "color: red"),
+        or ("@import url(x.css)", None) for a statement without a block
+    :rtype: list
+    """
+
+    l = []
+    n = len(css)
+    i = 0
+    start = 0
+
+    while i < n:
+        c = css[i]
+        if c in '"\'':
+            m = STRING_RE.match(css, i)
+            i = m.end() if m else n
+            continue
+        if css.startswith('/*', i):
+            j = css.find('*/', i + 2)
+            # Drop the comment
+            css = css[:i] + ' ' + (css[j + 2:] if j != -1 else '')
+            n = len(css)
+            continue
+        if c == ';':
+            if css[start:i].strip():
+                l.append((css[start:i].strip(), None))
+            start = i + 1
+        elif c == '{':
+            # Find the matching brace
+            depth = 1
+            j = i + 1
+            while j < n and depth:
+                if css[j] in '"\'':
+                    m = STRING_RE.match(css, j)
+                    j = m.end() if m else n
+                    continue
+                if css[j] == '{':
+                    depth += 1
+                elif css[j] == '}':
+                    depth -= 1
+                j += 1
+            l.append((css[start:i].strip(), css[i + 1:j - 1]))
+            start = i = j
+            continue
+        i += 1
+
+    return l
+
+def splitselectors(prelude):
+    """
+    :param prelude: (str) a selector list (e.g., ".a, :is(.b, .c)")
+    :returns: (list) the selectors (e.g., [".a", ":is(.b, .c)"])
+    :rtype: list
+    """
+
+    l = []
+    depth = 0
+    start = 0
+
+    for i, c in enumerate(prelude):
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            l.append(prelude[start:i].strip())
+            start = i + 1
+
+    l.append(prelude[start:].strip())
+
+    return l
+
+def isused(selector, s_used):
+    """
+    :param selector: (str) a selector (e.g., "nav .ssg-link:hover")
+    :param s_used: (set) the elements, classes, and ids used by the site
+    :returns: (bool) False if the selector can't match anything in the site
+    :rtype: bool
+    """
+
+    # Escaped characters (e.g., .md\:flex): keep, to be safe
+    if '\\' in selector:
+        return True
+
+    s = STRING_RE.sub('', selector)
+    # Attribute selectors and pseudo-class arguments (e.g., :not(.x)) don't have to match
+    s = ATTRIBUTE_RE.sub('', s)
+    while '(' in s:
+        s2 = PARENS_RE.sub('', s)
+        if s2 == s:
+            break
+        s = s2
+    s = PSEUDO_RE.sub('', s)
+
+    for m in CLASSID_RE.finditer(s):
+        if m.group(1) + m.group(2) not in s_used:
+            return False
+
+    for i in ELEMENT_RE.findall(s):
+        if i.lower() not in s_used:
+            return False
+
+    return True
+
+def prune(css, s_used):
+    """
+    Remove the rules which can't match anything in the site
+
+    :param css: (str) CSS
+    :param s_used: (set) the elements, classes (.name), and ids (#name) used by the site
+    :returns: (str) the pruned CSS
+    :rtype: str
+    """
+
+    l = []
+
+    for prelude, block in splitrules(css):
+        if block is None:
+            l.append(f'{prelude};')
+        elif prelude.startswith('@'):
+            if prelude.split()[0].lower() in NESTED_AT_RULES:
+                inner = prune(block, s_used)
+                if inner.strip():
+                    l.append(f'{prelude}{{{inner}}}')
+            else:
+                l.append(f'{prelude}{{{block}}}')
+        else:
+            l_kept = [i for i in splitselectors(prelude) if isused(i, s_used)]
+            if l_kept:
+                l.append(f"{','.join(l_kept)}{{{block}}}")
+
+    return '\n'.join(l)
+
+def prunefiles(outputdir, l_cssfiles, s_used, assets, cachedir, verbose=False):
+    """
+    Prune the stylesheets of the site, in place.
+    The full stylesheets are kept in the cache directory, since the pruned ones
+    may need to be pruned again (from the full ones) when the site changes.
+    A stylesheet which isn't the one we last wrote (e.g., it was copied again
+    by jinjagen.py --assets) is taken to be a new full stylesheet
+
+    :param outputdir: (str) path to the output directory
+    :param l_cssfiles: (list) the stylesheets (paths in the output directory)
+    :param s_used: (set) the elements, classes (.name), and ids (#name) used by the site
+    :param assets: (AssetIndex) the asset index
+    :param cachedir: (str) path to the cache directory
+    :param verbose: (bool) if True, print stuff
+    """
+
+    # A dict whose keys are stylesheets and whose values are the hashes of their pruned versions
+    recordfile = f'{cachedir}/prunedcss.json'
+    try:
+        with open(recordfile, 'r') as f:
+            d_pruned = json.load(f)
+    except:
+        d_pruned = dict()
+
+    numbytes = [0, 0]
+
+    for i in dict.fromkeys([i.lstrip('/') for i in l_cssfiles]):
+        fullfile = f'{cachedir}/fullcss/{i}'
+
+        if d_pruned.get(i) != assets.gethash(outputdir, i) or not os.path.isfile(fullfile):
+            # A new full stylesheet: keep it
+            os.makedirs(os.path.dirname(fullfile), exist_ok=True)
+            shutil.copyfile(f'{outputdir}/{i}', fullfile)
+
+        with open(fullfile, 'r') as f:
+            css = f.read()
+        mypruned = prune(css, s_used) + '\n'
+        numbytes[0] += len(css.encode())
+        numbytes[1] += len(mypruned.encode())
+
+        if verbose:
+            print(f'Pruned CSS: {i} ({len(css)} -> {len(mypruned)} chars)')
+
+        with open(f'{outputdir}/{i}', 'rb') as f:
+            unchanged = f.read() == mypruned.encode()
+        if not unchanged:
+            with open(f'{outputdir}/{i}.tmp', 'w') as f:
+                f.write(mypruned)
+            os.replace(f'{outputdir}/{i}.tmp', f'{outputdir}/{i}')
+            assets.setentry(outputdir, i)
+
+        d_pruned[i] = assets.gethash(outputdir, i)
+
+    with open(recordfile, 'w') as f:
+        json.dump(d_pruned, f)
+
+    print(f'Pruned CSS: {numbytes[0]} -> {numbytes[1]} bytes')
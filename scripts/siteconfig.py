@@ -54,6 +54,23 @@ ALLOWED_SOCIAL = [
     'mail'
 ]
 
+# Allowed values of DUPLICATES: how to write a page which duplicates another
+# (a page of the Latest Feed, or the homepage at its own url path, if DUPLICATEHOME)
+# 'copy' is the whole page; 'canonical' is the whole page, with a canonical link to the original;
+# 'alias' is a small page which only links (and redirects) to the original
+ALLOWED_DUPLICATES = [
+    'copy',
+    'canonical',
+    'alias'
+]
+
+# The template of alias pages (see DUPLICATES), unless d_TYPE2TEMPLATE has an 'alias' key
+ALIAS_TEMPLATE = 'theme_minimalist.alias.html'
+
+# The sprite of the social media icons (written if SOCIALSPRITE is on),
+# in the output directory. It only has the icons in d_SOCIALMEDIA
+SOCIALSPRITE_FILE = 'static/img/social.svg'
+
 # Required fields for post objects
 REQUIRED_POST_FIELDS = [
     "name",
@@ -100,4 +117,47 @@ REQUIRED_SECTION_FIELDS = [
     "showblurb",
     "description",
     "notes"
-]
\ No newline at end of file
+]
+
+# The build manifest, saved in the output directory.
+# It records a hash of the inputs of every page, so unchanged pages can be skipped
+MANIFEST = '.ssgmanifest.json'
+
+# The cache directory, inside the output directory.
+# It holds data reused between builds (e.g., compiled templates)
+CACHEDIR = '.ssgcache'
+
+# The content snapshot, inside the cache directory.
+# It holds the data structures derived from the content json files,
+# so they don't have to be created again if nothing changed
+SNAPSHOT = 'content.pickle'
+
+# The asset index, inside the cache directory.
+# It holds the size, mtime, and hash of the asset files (imgs, CSS, JS, etc.),
+# so unchanged files don't have to be hashed again
+ASSETINDEX = 'assets.json'
+
+# The record of minified CSS and JS files, inside the cache directory.
+# It holds the hash of the source each file was minified from,
+# so unchanged sources aren't minified again
+MINIFIED = 'minified.json'
+
+# The elements, classes, and ids used by each page, inside the cache directory
+# (written if PRUNECSS is on). Pages which didn't change aren't parsed again
+CSSUSAGE = 'cssusage.json'
+
+# The record of fingerprinted copies, inside the cache directory (written if FINGERPRINT is on).
+# Only the copies listed here are ever removed (when they're out of date)
+FINGERPRINTED = 'fingerprinted.json'
+
+# The cache policy (written if FINGERPRINT is on): a json file, in the output directory,
+# mapping every output file to its Cache-Control header (e.g., for S3 object metadata)
+CACHEPOLICY = '.ssgcachepolicy.json'
+
+# The Cache-Control headers of the cache policy:
+# 'immutable' for fingerprinted assets, 'html' for pages, and 'asset' for other assets
+d_CACHECONTROL = {
+    'immutable': 'public, max-age=31536000, immutable',
+    'html': 'public, max-age=0, must-revalidate',
+    'asset': 'public, max-age=3600'
+}
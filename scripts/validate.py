@@ -0,0 +1,233 @@
+#-------------------------------------------------------------------------------
+#
+#    validate.py
+#
+#    Check the content json files (and the files they refer to) for errors.
+#    Rather than stopping at the first error, every problem is collected,
+#    so they can all be fixed after a single run
+#
+#-------------------------------------------------------------------------------
+
+import re
+import datetime
+import colorme as color
+import assetindex
+
+from siteconfig import RESERVED
+from siteconfig import ALLOWED_TYPES
+from siteconfig import REQUIRED_POST_FIELDS
+from siteconfig import REQUIRED_SECTION_FIELDS
+
+# The required fields, by kind of page object
+# (compiled into sets once, rather than once per page object)
+d_SCHEMAS = {
+    'post': frozenset(REQUIRED_POST_FIELDS),
+    'section': frozenset(REQUIRED_SECTION_FIELDS)
+}
+
+# Sets, for fast lookups
+RESERVED_SET = frozenset(RESERVED)
+ALLOWED_TYPES_SET = frozenset(ALLOWED_TYPES)
+
+# Post dates look like 2025-01-31
+DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def parsedate(mydate):
+    """
+    Parse a post date. The feed (from the content json or the content database)
+    only has posts whose date parses
+
+    :param mydate: (str) the date (e.g., 2025-01-31)
+    :returns: (datetime.date) the date, or None if it isn't a valid date of the form YYYY-MM-DD
+    :rtype: datetime.date
+    """
+
+    if not isinstance(mydate, str) or not DATE_RE.fullmatch(mydate):
+        return None
+
+    try:
+        return datetime.date.fromisoformat(mydate)
+    except ValueError:
+        return None
+
+class Validator:
+    """
+    Collect the errors in the page objects of a site.
+
+    Each error is a dict with the keys:
+        "check" (the name of the check, e.g., "uniq:url"),
+        "url" (the url key of the page object, if any),
+        "message", and
+        "fatal" (if True, the data structures can't be built until the error is fixed)
+
+    The checks build hash indexes (e.g., url -> how many page objects have that url),
+    so each page object is only visited once. Likewise, file checks go through
+    an asset index, so each directory is only read once
+    """
+
+    def __init__(self, strict=True, assets=None):
+        # If False, don't check for required fields
+        self.strict = strict
+        # The index of files (see assetindex.py)
+        self.assets = assets if assets is not None else assetindex.AssetIndex()
+        # The list of errors
+        self.l_errors = []
+        # A dict whose keys are attributes (e.g., "url") and whose values are
+        # dicts mapping a value of the attribute to the number of page objects with that value
+        self.d_indexes = dict()
+
+    def error(self, check, message, url='', fatal=False):
+        """
+        Record an error
+
+        :param check: (str) the name of the check
+        :param message: (str) what's wrong
+        :param url: (str) the url key of the page object (if any)
+        :param fatal: (bool) if True, stop before building the data structures
+        """
+
+        self.l_errors.append({
+            'check': check,
+            'url': url,
+            'message': message,
+            'fatal': fatal
+        })
+
+    def check(self, condition, check, message, url='', fatal=False):
+        """
+        Record an error if the condition is False
+
+        :param condition: (bool) the condition which should be True
+        :param check: (str) the name of the check
+        :param message: (str) what's wrong
+        :param url: (str) the url key of the page object (if any)
+        :param fatal: (bool) if True, stop before building the data structures
+        """
+
+        if not condition:
+            self.error(check, message, url=url, fatal=fatal)
+
+    def index(self, attr, value):
+        """
+        Add a value to the index of an attribute
+
+        :param attr: (str) the attribute (e.g., "url")
+        :param value: the value of the attribute
+        """
+
+        d_index = self.d_indexes.setdefault(attr, dict())
+        d_index[value] = d_index.get(value, 0) + 1
+
+    def addpages(self, l_pages, kind):
+        """
+        Check the fields of a list of (raw) page objects, and index their url keys
+        (and, for sections, their categories)
+
+        :param l_pages: (list of dicts) the page objects, as read from the content json
+        :param kind: (str) "post", "section", or "special" (for l_SPECIAL_PAGES)
+        """
+
+        schema = d_SCHEMAS.get(kind)
+
+        for i in l_pages:
+            url = i.get('url', '')
+
+            # Required fields (of published page objects)
+            if self.strict and schema is not None and i.get('publish'):
+                if not i.keys() >= schema:
+                    missing = schema.difference(i)
+                    self.error('fields', f'Missing keys for {kind} {url}: {sorted(missing)}', url=url, fatal=True)
+
+            if 'url' not in i:
+                self.error('fields', f'Missing url for {kind}: {i}', fatal=True)
+                continue
+
+            self.index('url', url)
+
+            # Reserved urls (the special pages are allowed to use them)
+            if kind != 'special' and url in RESERVED_SET:
+                self.error('reserved', f'Clash with reserved url for page object: {url}', url=url)
+
+            # Type
+            if not i.get('type'):
+                self.error('type', f'Missing type for page object: {url}', url=url)
+            elif i['type'] not in ALLOWED_TYPES_SET:
+                self.error('type', f"Unknown type for page object: {url} ({i['type']})", url=url)
+
+            # Section categories (must be unique)
+            if kind == 'section':
+                self.index('category', i.get('category'))
+
+            # Dates of published posts (needed to sort the feed).
+            # A post may have no date (it's left out of the feed), but a date must be well-formed
+            if self.strict and kind == 'post' and i.get('publish') and i.get('date'):
+                self.checkdate(i['date'], url)
+
+    def checkdate(self, mydate, url):
+        """
+        Check a post date is a valid date of the form YYYY-MM-DD
+
+        :param mydate: (str) the date
+        :param url: (str) the url key of the post
+        """
+
+        if parsedate(mydate) is None:
+            self.error('date', f'Date must be of the form YYYY-MM-DD for post: {url} ({mydate})', url=url)
+
+    def adduniq(self, l_pages, attr):
+        """
+        Index an attribute of a list of page objects (e.g., the urlpaths of the published pages)
+
+        :param l_pages: (list of dicts) the page objects
+        :param attr: (str) the attribute
+        """
+
+        for i in l_pages:
+            self.index(attr, i[attr])
+
+    def checkuniq(self, attr):
+        """
+        Check the values of an indexed attribute are unique
+
+        :param attr: (str) the attribute (e.g., "url")
+        """
+
+        duplicates = [k for k, v in self.d_indexes.get(attr, dict()).items() if v > 1]
+
+        if duplicates:
+            self.error(f'uniq:{attr}', f'{attr} attribute must be unique but found overlap: {duplicates}')
+
+    def checkfiles(self, mydirectory, l_files, verbose=False):
+        """
+        Check files exist. The missing files are reported in one error
+
+        :param mydirectory: (str) path to the directory
+        :param l_files: (list) a list of files
+        :param verbose: (bool) if True, print stuff
+        """
+
+        if verbose:
+            print(f'Checking file existence: {len(l_files)} file(s) in {mydirectory}')
+
+        missing = self.assets.missing(mydirectory, l_files)
+
+        if missing:
+            self.error('file', f'{len(missing)} file(s) not found in {mydirectory}: {missing}')
+
+    def hasfatal(self):
+        """
+        :returns: (bool) True if there's an error which stops the data structures being built
+        :rtype: bool
+        """
+
+        return any(i['fatal'] for i in self.l_errors)
+
+    def report(self):
+        """
+        Print every error, then stop the whole show if there were any
+        """
+
+        for i in self.l_errors:
+            color.warnprint(f"ERROR [{i['check']}]: {i['message']}")
+
+        assert len(self.l_errors) == 0, f'Found {len(self.l_errors)} error(s) in the site data (see above)'